@@ -31,7 +31,7 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(
+def register_user(
     user_data: UserCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)  # Only admins can create users
@@ -73,7 +73,7 @@ async def register_user(
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(
+def login(
     login_data: LoginRequest,
     db: Session = Depends(get_db)
 ):
@@ -106,16 +106,18 @@ async def login(
     user.last_login = datetime.utcnow()
     db.commit()
     
-    return LoginResponse(
-        access_token=access_token,
-        token_type="bearer",
-        expires_in=settings.JWT_EXPIRATION_HOURS * 3600,  # Convert to seconds
-        user=user
-    )
+    # Returned as a plain dict so it is validated once, by the route's
+    # prebuilt LoginResponse validator, rather than built and re-validated
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": settings.JWT_EXPIRATION_HOURS * 3600,  # Convert to seconds
+        "user": user
+    }
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(
+def get_current_user_info(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get current user information"""
@@ -123,7 +125,7 @@ async def get_current_user_info(
 
 
 @router.put("/me", response_model=UserResponse)
-async def update_current_user(
+def update_current_user(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -158,7 +160,7 @@ async def update_current_user(
 
 
 @router.put("/me/password", response_model=dict)
-async def change_password(
+def change_password(
     password_update: UserPasswordUpdate,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -181,7 +183,7 @@ async def change_password(
 
 
 @router.get("/users", response_model=list[UserResponse])
-async def list_users(
+def list_users(
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(require_admin),
@@ -193,7 +195,7 @@ async def list_users(
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(
+def get_user(
     user_id: int,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
@@ -211,7 +213,7 @@ async def get_user(
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: int,
     user_update: UserUpdate,
     current_user: User = Depends(require_admin),
@@ -256,7 +258,7 @@ async def update_user(
 
 
 @router.delete("/users/{user_id}", response_model=dict)
-async def delete_user(
+def delete_user(
     user_id: int,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
@@ -18,7 +18,7 @@ router = APIRouter()
 
 
 @router.get("/consumption", response_model=List[EnergyReadingResponse])
-async def get_energy_consumption(
+def get_energy_consumption(
     meter_id: Optional[str] = Query(None, description="Filter by meter ID"),
     start_date: Optional[datetime] = Query(None, description="Start date for data range"),
     end_date: Optional[datetime] = Query(None, description="End date for data range"),
@@ -47,7 +47,7 @@ async def get_energy_consumption(
 
 
 @router.get("/consumption/summary", response_model=EnergyConsumptionSummary)
-async def get_consumption_summary(
+def get_consumption_summary(
     meter_id: Optional[str] = Query(None, description="Filter by meter ID"),
     period: str = Query("day", regex="^(hour|day|week|month)$", description="Aggregation period"),
     db: Session = Depends(get_db),
@@ -90,7 +90,7 @@ async def get_consumption_summary(
 
 
 @router.get("/meters", response_model=List[dict])
-async def get_smart_meters(
+def get_smart_meters(
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     meter_type: Optional[str] = Query(None, description="Filter by meter type"),
     db: Session = Depends(get_db),
@@ -122,7 +122,7 @@ async def get_smart_meters(
 
 
 @router.get("/consumption/hourly")
-async def get_hourly_consumption(
+def get_hourly_consumption(
     meter_id: Optional[str] = Query(None, description="Filter by meter ID"),
     days: int = Query(7, le=30, description="Number of days to include"),
     db: Session = Depends(get_db),
@@ -159,7 +159,7 @@ async def get_hourly_consumption(
 
 
 @router.get("/consumption/peak-hours")
-async def get_peak_hours(
+def get_peak_hours(
     meter_id: Optional[str] = Query(None, description="Filter by meter ID"),
     days: int = Query(30, le=90, description="Number of days to analyze"),
     db: Session = Depends(get_db),
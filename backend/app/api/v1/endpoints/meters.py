@@ -18,7 +18,7 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=SmartMeterResponse)
-async def register_smart_meter(
+def register_smart_meter(
     meter_data: SmartMeterCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
@@ -56,7 +56,7 @@ async def register_smart_meter(
 
 
 @router.post("/data")
-async def submit_meter_reading(
+def submit_meter_reading(
     reading_data: EnergyReadingCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -93,7 +93,7 @@ async def submit_meter_reading(
 
 
 @router.get("/", response_model=List[SmartMeterResponse])
-async def get_smart_meters(
+def get_smart_meters(
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     meter_type: Optional[str] = Query(None, description="Filter by meter type"),
     location: Optional[str] = Query(None, description="Filter by location"),
@@ -118,7 +118,7 @@ async def get_smart_meters(
 
 
 @router.get("/{meter_id}", response_model=SmartMeterResponse)
-async def get_smart_meter(
+def get_smart_meter(
     meter_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -134,7 +134,7 @@ async def get_smart_meter(
 
 
 @router.put("/{meter_id}")
-async def update_smart_meter(
+def update_smart_meter(
     meter_id: str,
     meter_data: SmartMeterCreate,
     db: Session = Depends(get_db),
@@ -160,7 +160,7 @@ async def update_smart_meter(
 
 
 @router.delete("/{meter_id}")
-async def deactivate_smart_meter(
+def deactivate_smart_meter(
     meter_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
@@ -181,7 +181,7 @@ async def deactivate_smart_meter(
 
 
 @router.get("/{meter_id}/status")
-async def get_meter_status(
+def get_meter_status(
     meter_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -236,7 +236,7 @@ async def get_meter_status(
 
 
 @router.get("/{meter_id}/readings")
-async def get_meter_readings(
+def get_meter_readings(
     meter_id: str,
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
@@ -265,7 +265,7 @@ async def get_meter_readings(
 
 
 @router.get("/{meter_id}/statistics")
-async def get_meter_statistics(
+def get_meter_statistics(
     meter_id: str,
     days: int = Query(30, ge=1, le=365, description="Number of days"),
     db: Session = Depends(get_db),
@@ -18,7 +18,7 @@ router = APIRouter()
 
 
 @router.get("/energy", response_model=List[EnergyPredictionResponse])
-async def get_energy_predictions(
+def get_energy_predictions(
     meter_id: Optional[str] = Query(None, description="Filter by meter ID"),
     hours_ahead: int = Query(24, ge=1, le=168, description="Hours to predict"),
     db: Session = Depends(get_db),
@@ -43,7 +43,7 @@ async def get_energy_predictions(
 
 
 @router.post("/energy/generate")
-async def generate_energy_predictions(
+def generate_energy_predictions(
     meter_id: Optional[str] = Query(None, description="Generate for specific meter"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -84,7 +84,7 @@ async def generate_energy_predictions(
 
 
 @router.get("/energy/accuracy")
-async def get_prediction_accuracy(
+def get_prediction_accuracy(
     meter_id: Optional[str] = Query(None, description="Filter by meter ID"),
     days: int = Query(7, ge=1, le=30, description="Days to analyze"),
     db: Session = Depends(get_db)
@@ -136,7 +136,7 @@ async def get_prediction_accuracy(
 
 
 @router.get("/models/status")
-async def get_model_status():
+def get_model_status():
     """Get ML model status and information"""
     
     try:
@@ -164,7 +164,7 @@ async def get_model_status():
 
 
 @router.post("/models/retrain")
-async def retrain_models(
+def retrain_models(
     meter_id: Optional[str] = Query(None, description="Train for specific meter"),
 ):
     """Trigger model retraining"""
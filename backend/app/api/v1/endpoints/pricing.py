@@ -23,7 +23,7 @@ pricing_service = PricingService()
 
 
 @router.get("/current", response_model=CurrentPriceResponse)
-async def get_current_price(
+def get_current_price(
     meter_type: str = Query("residential", regex="^(residential|commercial|industrial)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -37,7 +37,7 @@ async def get_current_price(
 
 
 @router.get("/forecast", response_model=List[PriceForecastResponse])
-async def get_price_forecast(
+def get_price_forecast(
     hours_ahead: int = Query(24, ge=1, le=168, description="Hours to forecast"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -51,7 +51,7 @@ async def get_price_forecast(
 
 
 @router.get("/optimization", response_model=List[PricingOptimizationResponse])
-async def get_pricing_optimization(
+def get_pricing_optimization(
     start_date: Optional[datetime] = Query(None, description="Start date for optimization data"),
     end_date: Optional[datetime] = Query(None, description="End date for optimization data"),
     limit: int = Query(100, le=1000, description="Maximum number of records"),
@@ -87,7 +87,7 @@ async def get_pricing_optimization(
 
 
 @router.post("/optimize")
-async def trigger_pricing_optimization(
+def trigger_pricing_optimization(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -100,7 +100,7 @@ async def trigger_pricing_optimization(
 
 
 @router.get("/history")
-async def get_pricing_history(
+def get_pricing_history(
     days: int = Query(30, ge=1, le=365, description="Number of days of history"),
     meter_type: str = Query("residential", regex="^(residential|commercial|industrial)$"),
     db: Session = Depends(get_db),
@@ -136,7 +136,7 @@ async def get_pricing_history(
 
 
 @router.get("/tiers")
-async def get_pricing_tiers(
+def get_pricing_tiers(
     current_user: User = Depends(get_current_user)
 ):
     """Get current pricing tier information"""
@@ -163,7 +163,7 @@ async def get_pricing_tiers(
     # Determine current tier
     if 17 <= current_hour <= 21:
         current_tier = "peak"
-    elif 22 <= current_hour <= 6:
+    elif current_hour >= 22 or current_hour <= 6:
         current_tier = "off_peak"
     else:
         current_tier = "standard"
@@ -176,7 +176,7 @@ async def get_pricing_tiers(
 
 
 @router.get("/market-conditions")
-async def get_market_conditions(
+def get_market_conditions(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -19,7 +19,7 @@ router = APIRouter()
 
 
 @router.get("/solar/generation")
-async def get_solar_generation(
+def get_solar_generation(
     panel_id: Optional[str] = Query(None, description="Filter by panel ID"),
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
@@ -63,7 +63,7 @@ async def get_solar_generation(
 
 
 @router.get("/wind/generation")
-async def get_wind_generation(
+def get_wind_generation(
     turbine_id: Optional[str] = Query(None, description="Filter by turbine ID"),
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
@@ -108,7 +108,7 @@ async def get_wind_generation(
 
 
 @router.get("/forecasts")
-async def get_renewable_forecasts(
+def get_renewable_forecasts(
     source_type: str = Query(..., regex="^(solar|wind)$", description="Source type"),
     hours_ahead: int = Query(24, ge=1, le=168, description="Hours to forecast"),
     db: Session = Depends(get_db),
@@ -143,7 +143,7 @@ async def get_renewable_forecasts(
 
 
 @router.get("/summary")
-async def get_renewable_summary(
+def get_renewable_summary(
     period: str = Query("day", regex="^(hour|day|week|month)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -203,7 +203,7 @@ async def get_renewable_summary(
 
 
 @router.get("/panels")
-async def get_solar_panels(
+def get_solar_panels(
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -236,7 +236,7 @@ async def get_solar_panels(
 
 
 @router.get("/turbines")
-async def get_wind_turbines(
+def get_wind_turbines(
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
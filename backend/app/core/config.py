@@ -59,10 +59,13 @@ class Settings(BaseSettings):
     BASE_ENERGY_PRICE: float = 0.12  # $/kWh
     PEAK_HOUR_MULTIPLIER: float = 1.5
     OFF_PEAK_MULTIPLIER: float = 0.8
+    PRICE_CACHE_TTL_SECONDS: float = 60.0  # Reuse the current optimized price for this long
     
     # Weather API
     WEATHER_UPDATE_INTERVAL_MINUTES: int = 30
     WEATHER_FORECAST_DAYS: int = 7
+    WEATHER_CACHE_TTL_SECONDS: int = 600  # Current conditions, shared per ~1 km site
+    WEATHER_FORECAST_CACHE_TTL_SECONDS: int = 1800
     
     # Renewable Energy
     SOLAR_PANEL_EFFICIENCY: float = 0.20
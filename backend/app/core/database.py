@@ -2,7 +2,7 @@
 Database configuration and session management
 """
 
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
@@ -28,6 +28,79 @@ Base = declarative_base()
 # Metadata for migrations
 metadata = MetaData()
 
+# Set by init_timescaledb() once hypertables and continuous aggregates exist
+timescale_enabled = False
+
+# Hypertables and one-minute continuous aggregates used by grid monitoring.
+# Continuous aggregates cannot be created inside a transaction, so these run
+# with autocommit.
+TIMESCALE_DDL = [
+    "SELECT create_hypertable('energy_readings', 'timestamp', "
+    "chunk_time_interval => INTERVAL '1 hour', if_not_exists => TRUE, migrate_data => TRUE)",
+    "SELECT create_hypertable('renewable_energy_generation', 'timestamp', "
+    "chunk_time_interval => INTERVAL '1 hour', if_not_exists => TRUE, migrate_data => TRUE)",
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS voltage_1min
+    WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+    SELECT time_bucket('1 minute', timestamp) AS bucket,
+           sum(voltage_l1::double precision) AS sum_voltage,
+           min(voltage_l1) AS min_voltage,
+           max(voltage_l1) AS max_voltage,
+           count(*) AS reading_count
+    FROM energy_readings
+    WHERE voltage_l1 IS NOT NULL
+    GROUP BY bucket
+    WITH NO DATA
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS power_1min
+    WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+    SELECT time_bucket('1 minute', timestamp) AS bucket,
+           sum(active_power::double precision) AS total_power
+    FROM energy_readings
+    WHERE active_power IS NOT NULL
+    GROUP BY bucket
+    WITH NO DATA
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS renewable_power_1min
+    WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+    SELECT time_bucket('1 minute', timestamp) AS bucket,
+           sum(power_output_kw) AS total_renewable,
+           count(*) AS source_count
+    FROM renewable_energy_generation
+    GROUP BY bucket
+    WITH NO DATA
+    """,
+] + [
+    # Columnar compression for chunks older than a day, segmented per device
+    # so per-meter scans decompress only their own segments
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM timescaledb_information.compression_settings
+            WHERE hypertable_name = '{table}'
+        ) THEN
+            ALTER TABLE {table} SET (
+                timescaledb.compress,
+                timescaledb.compress_segmentby = '{segment_by}',
+                timescaledb.compress_orderby = 'timestamp DESC'
+            );
+        END IF;
+    END $$
+    """
+    for table, segment_by in (("energy_readings", "meter_id"), ("renewable_energy_generation", "source_id"))
+] + [
+    f"SELECT add_compression_policy('{table}', INTERVAL '1 day', if_not_exists => TRUE)"
+    for table in ("energy_readings", "renewable_energy_generation")
+] + [
+    f"SELECT add_continuous_aggregate_policy('{view}', "
+    "start_offset => INTERVAL '1 hour', end_offset => INTERVAL '1 minute', "
+    "schedule_interval => INTERVAL '30 seconds', if_not_exists => TRUE)"
+    for view in ("voltage_1min", "power_1min", "renewable_power_1min")
+]
+
 
 def get_db():
     """
@@ -52,6 +125,32 @@ def init_db():
         raise
 
 
+def init_timescaledb() -> bool:
+    """
+    Convert time-series tables to hypertables and create continuous aggregates
+    """
+    global timescale_enabled
+
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            installed = conn.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+            ).scalar()
+            if not installed:
+                logger.info("TimescaleDB extension not installed, using plain tables")
+                return False
+        
+            for statement in TIMESCALE_DDL:
+                conn.execute(text(statement))
+    
+        timescale_enabled = True
+        logger.info("TimescaleDB hypertables and continuous aggregates ready")
+    except Exception as e:
+        logger.warning(f"TimescaleDB setup skipped: {e}")
+
+    return timescale_enabled
+
+
 def check_db_connection():
     """
     Check database connection
@@ -5,13 +5,13 @@ Main application entry point
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import uvicorn
 import logging
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import engine, Base, SessionLocal
+from app.core.database import engine, Base, SessionLocal, init_timescaledb
 from app.api.v1.api import api_router
 from app.services.mqtt_service import MQTTService
 from app.services.scheduler_service import SchedulerService
@@ -42,6 +42,9 @@ async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created/verified")
 
+    # Hypertables and continuous aggregates (no-op without TimescaleDB)
+    init_timescaledb()
+
     # Initialize database with sample data
     try:
         initialize_database()
@@ -87,6 +90,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -115,7 +119,7 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """Health check endpoint"""
     try:
         # Check database connection
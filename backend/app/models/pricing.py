@@ -2,7 +2,7 @@
 Energy pricing and market data models
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, JSON, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -75,6 +75,13 @@ class DynamicPricing(Base):
     
     created_at = Column(DateTime, server_default=func.now())
     
+    __table_args__ = (
+        # Each run appends the next 24 hours, so target times track insertion
+        # order closely enough for a block-range index on forecast range scans
+        Index("dynamic_pricing_target_ts_brin", "target_timestamp",
+              postgresql_using="brin", postgresql_with={"pages_per_range": 32}),
+    )
+    
     def __repr__(self):
         return f"<DynamicPricing(target='{self.target_timestamp}', price={self.optimized_price_kwh})>"
 
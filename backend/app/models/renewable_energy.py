@@ -2,7 +2,7 @@
 Renewable energy data models
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -64,10 +64,11 @@ class RenewableEnergyGeneration(Base):
     """Renewable energy generation data"""
     __tablename__ = "renewable_energy_generation"
     
-    id = Column(Integer, primary_key=True, index=True)
+    # timestamp is part of the key so the table can be a TimescaleDB hypertable
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     source_id = Column(String(50), nullable=False, index=True)  # panel_id or turbine_id
     source_type = Column(String(20), nullable=False)  # solar, wind
-    timestamp = Column(DateTime, nullable=False, index=True)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     
     # Generation data
     power_output_kw = Column(Float, nullable=False)  # Current power output
@@ -85,6 +86,11 @@ class RenewableEnergyGeneration(Base):
     
     created_at = Column(DateTime, server_default=func.now())
     
+    __table_args__ = (
+        Index("renewable_energy_generation_ts_brin", "timestamp",
+              postgresql_using="brin", postgresql_with={"pages_per_range": 32}),
+    )
+    
     def __repr__(self):
         return f"<RenewableGeneration(source_id='{self.source_id}', type='{self.source_type}', power={self.power_output_kw}kW)>"
 
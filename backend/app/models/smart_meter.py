@@ -2,7 +2,7 @@
 Smart Meter data models
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, REAL, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -36,30 +36,35 @@ class EnergyReading(Base):
     """Energy consumption reading model"""
     __tablename__ = "energy_readings"
     
-    id = Column(Integer, primary_key=True, index=True)
+    # timestamp is part of the key so the table can be a TimescaleDB hypertable
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     meter_id = Column(String(50), ForeignKey("smart_meters.meter_id"), nullable=False)
-    timestamp = Column(DateTime, nullable=False, index=True)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     
     # Energy measurements (kWh)
     active_energy = Column(Float, nullable=False)  # Total active energy
     reactive_energy = Column(Float, nullable=True)  # Reactive energy
     apparent_energy = Column(Float, nullable=True)  # Apparent energy
     
+    # Instantaneous sensor values are stored as 4-byte REAL: sensor precision
+    # is far below float32's, and narrower rows mean fewer pages per scan.
+    # Cumulative energy columns stay double precision for billing sums.
+    
     # Power measurements (kW)
-    active_power = Column(Float, nullable=True)  # Instantaneous active power
-    reactive_power = Column(Float, nullable=True)  # Reactive power
-    power_factor = Column(Float, nullable=True)  # Power factor
+    active_power = Column(REAL, nullable=True)  # Instantaneous active power
+    reactive_power = Column(REAL, nullable=True)  # Reactive power
+    power_factor = Column(REAL, nullable=True)  # Power factor
     
     # Voltage and current
-    voltage_l1 = Column(Float, nullable=True)  # Line 1 voltage
-    voltage_l2 = Column(Float, nullable=True)  # Line 2 voltage
-    voltage_l3 = Column(Float, nullable=True)  # Line 3 voltage
-    current_l1 = Column(Float, nullable=True)  # Line 1 current
-    current_l2 = Column(Float, nullable=True)  # Line 2 current
-    current_l3 = Column(Float, nullable=True)  # Line 3 current
+    voltage_l1 = Column(REAL, nullable=True)  # Line 1 voltage
+    voltage_l2 = Column(REAL, nullable=True)  # Line 2 voltage
+    voltage_l3 = Column(REAL, nullable=True)  # Line 3 voltage
+    current_l1 = Column(REAL, nullable=True)  # Line 1 current
+    current_l2 = Column(REAL, nullable=True)  # Line 2 current
+    current_l3 = Column(REAL, nullable=True)  # Line 3 current
     
     # Frequency
-    frequency = Column(Float, nullable=True)
+    frequency = Column(REAL, nullable=True)
     
     # Data quality
     quality_flag = Column(String(20), default="good")  # good, estimated, missing
@@ -69,6 +74,17 @@ class EnergyReading(Base):
     # Relationships
     meter = relationship("SmartMeter", back_populates="readings")
     
+    __table_args__ = (
+        # Cheap range index for append-only time-series scans
+        Index("energy_readings_ts_brin", "timestamp",
+              postgresql_using="brin", postgresql_with={"pages_per_range": 32}),
+        # Recent-window aggregates in grid monitoring filter on these columns
+        Index("energy_readings_ts_voltage", "timestamp",
+              postgresql_where=voltage_l1.isnot(None)),
+        Index("energy_readings_ts_active_power", "timestamp",
+              postgresql_where=active_power.isnot(None)),
+    )
+    
     def __repr__(self):
         return f"<EnergyReading(meter_id='{self.meter_id}', timestamp='{self.timestamp}', active_energy={self.active_energy})>"
 
@@ -2,7 +2,7 @@
 User schemas for API requests and responses
 """
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import Optional
 from datetime import datetime
 from app.models.user import UserRole
@@ -11,7 +11,7 @@ from app.models.user import UserRole
 class UserBase(BaseModel):
     """Base user schema"""
     username: str = Field(..., min_length=3, max_length=50)
-    email: str = Field(..., pattern=r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    email: EmailStr
     full_name: Optional[str] = None
 
 
@@ -23,7 +23,7 @@ class UserCreate(UserBase):
 
 class UserUpdate(BaseModel):
     """Schema for updating user information"""
-    email: Optional[str] = Field(None, pattern=r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    email: Optional[EmailStr] = None
     full_name: Optional[str] = None
     role: Optional[UserRole] = None
     is_active: Optional[bool] = None
@@ -37,6 +37,7 @@ class UserPasswordUpdate(BaseModel):
 
 class UserResponse(UserBase):
     """Schema for user response"""
+    email: str  # Stored value; only validated on input
     id: int
     role: UserRole
     is_active: bool
@@ -4,10 +4,14 @@ Handles billing calculations and invoice generation
 """
 
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from dateutil.relativedelta import relativedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert
 
 from app.core.config import settings
 from app.core.database import SessionLocal
@@ -16,6 +20,134 @@ from app.models.pricing import CustomerBilling, EnergyPrice
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round-trip when streaming a meter's monthly readings
+READINGS_BATCH_SIZE = 1000
+
+# Time-of-use buckets, indexed by hour of day:
+# 0-6 off-peak, 7-16 standard, 17-21 peak, 22-23 off-peak
+_OFF_PEAK, _STANDARD, _PEAK = 0, 1, 2
+_HOUR_BUCKET = (_OFF_PEAK,) * 7 + (_STANDARD,) * 10 + (_PEAK,) * 5 + (_OFF_PEAK,) * 2
+
+# Tariff constants, in integer units
+_TYPE_MULTIPLIER_PCT = {'residential': 100, 'commercial': 95, 'industrial': 90}
+_DEMAND_RATE_CENTS_KW = {'commercial': 1500, 'industrial': 1200}  # $15 / $12 per kW
+_TRANSMISSION_CENTS_MWH = 2000  # $0.02/kWh
+_DISTRIBUTION_CENTS_MWH = 3000  # $0.03/kWh
+_TAX_RATE_PCT = 8
+
+# Per-meter-type lookup tables for the vectorized path; the last slot is
+# the default for unknown meter types
+_TYPE_INDEX = {meter_type: i for i, meter_type in enumerate(_TYPE_MULTIPLIER_PCT)}
+_MULTIPLIER_TABLE = np.array([*_TYPE_MULTIPLIER_PCT.values(), 100], dtype=np.int64)
+_DEMAND_RATE_TABLE = np.array(
+    [_DEMAND_RATE_CENTS_KW.get(meter_type, 0) for meter_type in _TYPE_MULTIPLIER_PCT] + [0],
+    dtype=np.int64
+)
+
+
+@lru_cache(maxsize=256)
+def _month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    """Get the [start, end) datetimes of a calendar month"""
+    start_date = datetime(year, month, 1)
+    return start_date, start_date + relativedelta(months=1)
+
+
+def _to_milli(value: float) -> int:
+    """Convert kWh/kW to integer Wh/W"""
+    return int(round(value * 1000))
+
+
+def _to_cents_per_mwh(price_kwh: float) -> int:
+    """Convert a $/kWh price to integer cents per MWh"""
+    return int(round(price_kwh * 100_000))
+
+
+@dataclass(slots=True, frozen=True)
+class Consumption:
+    """Categorized consumption for a billing period, in integer Wh / W"""
+    total_energy: int
+    peak_energy: int
+    off_peak_energy: int
+    standard_energy: int
+    peak_demand: int
+    reading_count: int
+    
+    def to_kwh(self) -> Dict:
+        """Convert to kWh / kW for output"""
+        return {
+            'total_energy': self.total_energy / 1000,
+            'peak_energy': self.peak_energy / 1000,
+            'off_peak_energy': self.off_peak_energy / 1000,
+            'standard_energy': self.standard_energy / 1000,
+            'peak_demand': self.peak_demand / 1000,
+            'reading_count': self.reading_count
+        }
+
+
+@dataclass(slots=True, frozen=True)
+class Charges:
+    """Bill charges in integer cents"""
+    energy: int
+    demand: int
+    transmission: int
+    distribution: int
+    taxes: int
+    
+    @property
+    def total(self) -> int:
+        return self.energy + self.demand + self.transmission + self.distribution + self.taxes
+    
+    def to_dollars(self) -> Dict:
+        """Convert to dollars for output"""
+        return {
+            'energy': self.energy / 100,
+            'demand': self.demand / 100,
+            'transmission': self.transmission / 100,
+            'distribution': self.distribution / 100,
+            'taxes': self.taxes / 100
+        }
+
+
+@dataclass(slots=True, frozen=True)
+class ChargesBatch:
+    """Bill charges for many meters as parallel integer-cent arrays"""
+    energy: np.ndarray
+    demand: np.ndarray
+    transmission: np.ndarray
+    distribution: np.ndarray
+    taxes: np.ndarray
+    
+    def __getitem__(self, index: int) -> Charges:
+        return Charges(
+            energy=int(self.energy[index]),
+            demand=int(self.demand[index]),
+            transmission=int(self.transmission[index]),
+            distribution=int(self.distribution[index]),
+            taxes=int(self.taxes[index])
+        )
+
+
+def _build_consumption(bucket_energy: List[float], peak_demand: float, reading_count: int) -> Consumption:
+    """Build integer Wh/W consumption figures from per-bucket kWh totals"""
+    # The total is derived from the buckets so it always matches their sum
+    peak_wh = _to_milli(bucket_energy[_PEAK])
+    off_peak_wh = _to_milli(bucket_energy[_OFF_PEAK])
+    standard_wh = _to_milli(bucket_energy[_STANDARD])
+    
+    return Consumption(
+        total_energy=peak_wh + off_peak_wh + standard_wh,
+        peak_energy=peak_wh,
+        off_peak_energy=off_peak_wh,
+        standard_energy=standard_wh,
+        peak_demand=_to_milli(peak_demand),
+        reading_count=reading_count
+    )
+
+
+def _div_round(numerator: int, denominator: int) -> int:
+    """Integer division rounding half up (for non-negative values)"""
+    return (numerator + denominator // 2) // denominator
+
 
 class BillingService:
     """Service for customer billing and invoice generation"""
@@ -29,120 +161,158 @@ class BillingService:
         """Calculate monthly bill for a specific meter"""
         try:
             db = SessionLocal()
-            
-            # Get meter information
-            meter = db.query(SmartMeter).filter(SmartMeter.meter_id == meter_id).first()
-            if not meter:
-                raise ValueError(f"Meter {meter_id} not found")
-            
-            # Calculate billing period
-            start_date = billing_month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            if billing_month.month == 12:
-                end_date = start_date.replace(year=start_date.year + 1, month=1)
-            else:
-                end_date = start_date.replace(month=start_date.month + 1)
-            
-            # Get energy readings for the billing period
-            readings = db.query(EnergyReading).filter(
-                EnergyReading.meter_id == meter_id,
-                EnergyReading.timestamp >= start_date,
-                EnergyReading.timestamp < end_date
-            ).all()
-            
-            if not readings:
-                logger.warning(f"No readings found for meter {meter_id} in period {start_date} to {end_date}")
-                return self._create_empty_bill(meter_id, start_date, end_date)
-            
-            # Calculate consumption by time period
-            consumption_data = self._categorize_consumption(readings)
-            
-            # Get pricing information
-            pricing = self._get_pricing_for_period(start_date, end_date, db)
-            
-            # Calculate charges
-            charges = self._calculate_charges(consumption_data, pricing, meter.meter_type)
-            
-            # Calculate total bill
-            total_amount = sum(charges.values())
-            
-            # Create billing record
-            bill = CustomerBilling(
-                meter_id=meter_id,
-                billing_period_start=start_date,
-                billing_period_end=end_date,
-                total_energy_kwh=consumption_data['total_energy'],
-                peak_energy_kwh=consumption_data['peak_energy'],
-                off_peak_energy_kwh=consumption_data['off_peak_energy'],
-                peak_demand_kw=consumption_data['peak_demand'],
-                energy_charges=charges['energy'],
-                demand_charges=charges['demand'],
-                transmission_charges=charges['transmission'],
-                distribution_charges=charges['distribution'],
-                taxes_and_fees=charges['taxes'],
-                total_amount=total_amount,
-                due_date=end_date + timedelta(days=30),
-                payment_status='pending'
-            )
-            
-            db.add(bill)
-            db.commit()
-            db.refresh(bill)
-            
-            db.close()
-            
-            return {
-                'bill_id': bill.id,
-                'meter_id': meter_id,
-                'billing_period': {
-                    'start': start_date,
-                    'end': end_date
-                },
-                'consumption': consumption_data,
-                'charges': charges,
-                'total_amount': total_amount,
-                'due_date': bill.due_date,
-                'status': 'generated'
-            }
+            try:
+                # Get meter information
+                meter = db.query(SmartMeter).filter(SmartMeter.meter_id == meter_id).first()
+                if not meter:
+                    raise ValueError(f"Meter {meter_id} not found")
+                
+                start_date, end_date = _month_bounds(billing_month.year, billing_month.month)
+                pricing = self._get_pricing_for_period(start_date, end_date, db)
+                
+                bill = self._collect_bill(meter, start_date, end_date, pricing, db)
+                if bill['status'] == 'generated':
+                    self._persist_bills([bill], db)
+                
+                return bill
+            finally:
+                db.close()
             
         except Exception as e:
             logger.error(f"Error calculating bill for meter {meter_id}: {e}")
             raise
     
-    def _categorize_consumption(self, readings: List[EnergyReading]) -> Dict:
-        """Categorize energy consumption by time periods"""
-        total_energy = 0
-        peak_energy = 0
-        off_peak_energy = 0
-        standard_energy = 0
-        peak_demand = 0
+    def _collect_bill(self, meter: SmartMeter, start_date: datetime, end_date: datetime,
+                      pricing: Dict, db: Session) -> Dict:
+        """Read a meter's consumption for the period and compute its bill"""
+        # Stream energy readings for the billing period in batches rather
+        # than materializing the whole month
+        readings = db.query(
+            EnergyReading.timestamp,
+            EnergyReading.active_energy,
+            func.coalesce(EnergyReading.active_power, 0).label('active_power')
+        ).filter(
+            EnergyReading.meter_id == meter.meter_id,
+            EnergyReading.timestamp >= start_date,
+            EnergyReading.timestamp < end_date
+        ).execution_options(stream_results=True).yield_per(READINGS_BATCH_SIZE)
+        
+        # Calculate consumption by time period
+        consumption_data = self._categorize_consumption(readings)
+        
+        if not consumption_data.reading_count:
+            logger.warning(f"No readings found for meter {meter.meter_id} in period {start_date} to {end_date}")
+            return self._create_empty_bill(meter.meter_id, start_date, end_date)
+        
+        return self._compute_bill_row(
+            meter.meter_id, meter.meter_type, consumption_data, pricing, start_date, end_date
+        )
+    
+    def _compute_bill_row(self, meter_id: str, meter_type: str, consumption_data: Consumption,
+                          pricing: Dict, start_date: datetime, end_date: datetime) -> Dict:
+        """Compute a bill from categorized consumption (no database access)"""
+        charges = self._calculate_charges(consumption_data, pricing, meter_type)
+        return self._format_bill(meter_id, consumption_data, charges, start_date, end_date)
+    
+    def _format_bill(self, meter_id: str, consumption_data: Consumption, charges: Charges,
+                     start_date: datetime, end_date: datetime) -> Dict:
+        """Build the bill dict, converting to kWh and dollars at the output boundary"""
+        return {
+            'meter_id': meter_id,
+            'billing_period': {
+                'start': start_date,
+                'end': end_date
+            },
+            'consumption': consumption_data.to_kwh(),
+            'charges': charges.to_dollars(),
+            'total_amount': charges.total / 100,
+            'due_date': end_date + timedelta(days=30),
+            'status': 'generated'
+        }
+    
+    def _persist_bills(self, bills: List[Dict], db: Session):
+        """Insert generated bills in a single statement and commit once"""
+        if not bills:
+            return
+        
+        rows = [
+            {
+                'meter_id': bill['meter_id'],
+                'billing_period_start': bill['billing_period']['start'],
+                'billing_period_end': bill['billing_period']['end'],
+                'total_energy_kwh': bill['consumption']['total_energy'],
+                'peak_energy_kwh': bill['consumption']['peak_energy'],
+                'off_peak_energy_kwh': bill['consumption']['off_peak_energy'],
+                'peak_demand_kw': bill['consumption']['peak_demand'],
+                'energy_charges': bill['charges']['energy'],
+                'demand_charges': bill['charges']['demand'],
+                'transmission_charges': bill['charges']['transmission'],
+                'distribution_charges': bill['charges']['distribution'],
+                'taxes_and_fees': bill['charges']['taxes'],
+                'total_amount': bill['total_amount'],
+                'due_date': bill['due_date'],
+                'payment_status': 'pending'
+            }
+            for bill in bills
+        ]
+        
+        try:
+            bill_ids = db.execute(
+                insert(CustomerBilling).returning(CustomerBilling.id, sort_by_parameter_order=True),
+                rows
+            ).scalars().all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        for bill, bill_id in zip(bills, bill_ids):
+            bill['bill_id'] = bill_id
+    
+    def _categorize_consumption(self, readings: Iterable) -> Consumption:
+        """Categorize (timestamp, active_energy, active_power) rows by time period"""
+        bucket_energy = [0.0, 0.0, 0.0]
+        peak_demand = 0.0
+        reading_count = 0
         
         for reading in readings:
-            hour = reading.timestamp.hour
-            energy = reading.active_energy or 0
-            power = reading.active_power or 0
-            
-            total_energy += energy
-            peak_demand = max(peak_demand, power)
-            
+            reading_count += 1
             # Categorize by time of use
-            if 17 <= hour <= 21:  # Peak hours
-                peak_energy += energy
-            elif 22 <= hour <= 6:  # Off-peak hours
-                off_peak_energy += energy
-            else:  # Standard hours
-                standard_energy += energy
+            bucket_energy[_HOUR_BUCKET[reading.timestamp.hour]] += reading.active_energy
+            peak_demand = max(peak_demand, reading.active_power)
+        
+        return _build_consumption(bucket_energy, peak_demand, reading_count)
+    
+    def _aggregate_consumption(self, start_date: datetime, end_date: datetime,
+                               db: Session) -> Dict[str, Consumption]:
+        """Aggregate every meter's consumption for the period in one query"""
+        hour = func.extract('hour', EnergyReading.timestamp).label('hour')
+        rows = db.query(
+            EnergyReading.meter_id,
+            hour,
+            func.coalesce(func.sum(EnergyReading.active_energy), 0).label('energy'),
+            func.coalesce(func.max(EnergyReading.active_power), 0).label('peak_power'),
+            func.count(EnergyReading.id).label('reading_count')
+        ).filter(
+            EnergyReading.timestamp >= start_date,
+            EnergyReading.timestamp < end_date
+        ).group_by(EnergyReading.meter_id, hour).all()
+        
+        # Fold the per-hour groups into time-of-use buckets per meter
+        totals: Dict[str, List] = {}
+        for row in rows:
+            meter_total = totals.setdefault(row.meter_id, [[0.0, 0.0, 0.0], 0.0, 0])
+            meter_total[0][_HOUR_BUCKET[int(row.hour)]] += row.energy
+            meter_total[1] = max(meter_total[1], row.peak_power)
+            meter_total[2] += row.reading_count
         
         return {
-            'total_energy': round(total_energy, 2),
-            'peak_energy': round(peak_energy, 2),
-            'off_peak_energy': round(off_peak_energy, 2),
-            'standard_energy': round(standard_energy, 2),
-            'peak_demand': round(peak_demand, 2),
-            'reading_count': len(readings)
+            meter_id: _build_consumption(*meter_total)
+            for meter_id, meter_total in totals.items()
         }
     
     def _get_pricing_for_period(self, start_date: datetime, end_date: datetime, db: Session) -> Dict:
-        """Get pricing information for billing period"""
+        """Get pricing information for billing period (integer cents per MWh)"""
         # Get average pricing for the period
         pricing = db.query(
             func.avg(EnergyPrice.base_price_kwh).label('base_price'),
@@ -154,59 +324,94 @@ class BillingService:
         ).first()
         
         if pricing and pricing.base_price:
-            return {
-                'base_price_kwh': float(pricing.base_price),
-                'peak_price_kwh': float(pricing.peak_price),
-                'off_peak_price_kwh': float(pricing.off_peak_price)
-            }
+            base_price = float(pricing.base_price)
+            peak_price = float(pricing.peak_price)
+            off_peak_price = float(pricing.off_peak_price)
         else:
             # Fallback to default pricing
-            return {
-                'base_price_kwh': self.base_price,
-                'peak_price_kwh': self.base_price * self.peak_multiplier,
-                'off_peak_price_kwh': self.base_price * self.off_peak_multiplier
-            }
-    
-    def _calculate_charges(self, consumption: Dict, pricing: Dict, meter_type: str) -> Dict:
-        """Calculate various charges for the bill"""
+            base_price = self.base_price
+            peak_price = self.base_price * self.peak_multiplier
+            off_peak_price = self.base_price * self.off_peak_multiplier
         
-        # Meter type multipliers
-        type_multipliers = {
-            'residential': 1.0,
-            'commercial': 0.95,
-            'industrial': 0.90
+        return {
+            'base_price_mwh': _to_cents_per_mwh(base_price),
+            'peak_price_mwh': _to_cents_per_mwh(peak_price),
+            'off_peak_price_mwh': _to_cents_per_mwh(off_peak_price)
         }
-        multiplier = type_multipliers.get(meter_type, 1.0)
+    
+    def _calculate_charges(self, consumption: Consumption, pricing: Dict, meter_type: str) -> Charges:
+        """Calculate various charges for the bill in integer cents"""
+        
+        multiplier = _TYPE_MULTIPLIER_PCT.get(meter_type, 100)
         
-        # Energy charges
-        energy_charge = (
-            consumption['peak_energy'] * pricing['peak_price_kwh'] * multiplier +
-            consumption['off_peak_energy'] * pricing['off_peak_price_kwh'] * multiplier +
-            consumption['standard_energy'] * pricing['base_price_kwh'] * multiplier
+        # Energy charges: Wh * cents/MWh * percent -> cents
+        energy_charge = _div_round(
+            (
+                consumption.peak_energy * pricing['peak_price_mwh'] +
+                consumption.off_peak_energy * pricing['off_peak_price_mwh'] +
+                consumption.standard_energy * pricing['base_price_mwh']
+            ) * multiplier,
+            1_000_000 * 100
         )
         
-        # Demand charges (for commercial and industrial)
-        demand_charge = 0
-        if meter_type in ['commercial', 'industrial']:
-            demand_rate = 15.0 if meter_type == 'commercial' else 12.0  # $/kW
-            demand_charge = consumption['peak_demand'] * demand_rate
+        # Demand charges (commercial and industrial only): W * cents/kW -> cents
+        demand_charge = _div_round(
+            consumption.peak_demand * _DEMAND_RATE_CENTS_KW.get(meter_type, 0), 1000
+        )
         
-        # Transmission and distribution charges
-        transmission_charge = consumption['total_energy'] * 0.02  # $0.02/kWh
-        distribution_charge = consumption['total_energy'] * 0.03  # $0.03/kWh
+        # Transmission and distribution charges: Wh * cents/MWh -> cents
+        transmission_charge = _div_round(consumption.total_energy * _TRANSMISSION_CENTS_MWH, 1_000_000)
+        distribution_charge = _div_round(consumption.total_energy * _DISTRIBUTION_CENTS_MWH, 1_000_000)
         
         # Taxes and fees
         subtotal = energy_charge + demand_charge + transmission_charge + distribution_charge
-        tax_rate = 0.08  # 8% tax
-        taxes = subtotal * tax_rate
+        taxes = _div_round(subtotal * _TAX_RATE_PCT, 100)
         
-        return {
-            'energy': round(energy_charge, 2),
-            'demand': round(demand_charge, 2),
-            'transmission': round(transmission_charge, 2),
-            'distribution': round(distribution_charge, 2),
-            'taxes': round(taxes, 2)
-        }
+        return Charges(
+            energy=energy_charge,
+            demand=demand_charge,
+            transmission=transmission_charge,
+            distribution=distribution_charge,
+            taxes=taxes
+        )
+    
+    def _calculate_charges_vec(self, consumptions: List[Consumption], pricing: Dict,
+                               meter_types: List[str]) -> ChargesBatch:
+        """Calculate charges for many meters at once in integer cents"""
+        peak = np.array([c.peak_energy for c in consumptions], dtype=np.int64)
+        off_peak = np.array([c.off_peak_energy for c in consumptions], dtype=np.int64)
+        standard = np.array([c.standard_energy for c in consumptions], dtype=np.int64)
+        total = np.array([c.total_energy for c in consumptions], dtype=np.int64)
+        peak_demand = np.array([c.peak_demand for c in consumptions], dtype=np.int64)
+        
+        default_index = len(_TYPE_INDEX)
+        type_index = np.array(
+            [_TYPE_INDEX.get(meter_type, default_index) for meter_type in meter_types], dtype=np.intp
+        )
+        
+        # Same integer formulas as _calculate_charges, one array op per term
+        energy_charge = _div_round(
+            (
+                peak * pricing['peak_price_mwh'] +
+                off_peak * pricing['off_peak_price_mwh'] +
+                standard * pricing['base_price_mwh']
+            ) * _MULTIPLIER_TABLE[type_index],
+            1_000_000 * 100
+        )
+        demand_charge = _div_round(peak_demand * _DEMAND_RATE_TABLE[type_index], 1000)
+        transmission_charge = _div_round(total * _TRANSMISSION_CENTS_MWH, 1_000_000)
+        distribution_charge = _div_round(total * _DISTRIBUTION_CENTS_MWH, 1_000_000)
+        
+        subtotal = energy_charge + demand_charge + transmission_charge + distribution_charge
+        taxes = _div_round(subtotal * _TAX_RATE_PCT, 100)
+        
+        return ChargesBatch(
+            energy=energy_charge,
+            demand=demand_charge,
+            transmission=transmission_charge,
+            distribution=distribution_charge,
+            taxes=taxes
+        )
     
     def _create_empty_bill(self, meter_id: str, start_date: datetime, end_date: datetime) -> Dict:
         """Create empty bill when no readings are available"""
@@ -240,42 +445,52 @@ class BillingService:
         try:
             if billing_month is None:
                 # Default to previous month
-                today = datetime.utcnow()
-                if today.month == 1:
-                    billing_month = today.replace(year=today.year - 1, month=12)
-                else:
-                    billing_month = today.replace(month=today.month - 1)
+                billing_month = datetime.utcnow() - relativedelta(months=1)
             
             db = SessionLocal()
-            
-            # Get all active meters
-            meters = db.query(SmartMeter).filter(SmartMeter.is_active == True).all()
-            
-            generated_bills = []
-            failed_bills = []
-            
-            for meter in meters:
-                try:
-                    bill = self.calculate_monthly_bill(meter.meter_id, billing_month)
-                    generated_bills.append(bill)
-                    logger.info(f"Generated bill for meter {meter.meter_id}")
-                except Exception as e:
-                    logger.error(f"Failed to generate bill for meter {meter.meter_id}: {e}")
-                    failed_bills.append({
-                        'meter_id': meter.meter_id,
-                        'error': str(e)
-                    })
-            
-            db.close()
-            
-            logger.info(f"Generated {len(generated_bills)} bills, {len(failed_bills)} failures")
+            try:
+                # Get all active meters
+                meters = db.query(SmartMeter).filter(SmartMeter.is_active == True).all()
+                
+                # Billing period and pricing are shared by every meter
+                start_date, end_date = _month_bounds(billing_month.year, billing_month.month)
+                pricing = self._get_pricing_for_period(start_date, end_date, db)
+                
+                # One aggregate query for every meter instead of one per meter
+                consumption_by_meter = self._aggregate_consumption(start_date, end_date, db)
+                
+                billed_meters = []
+                empty_bills = []
+                for meter in meters:
+                    if meter.meter_id in consumption_by_meter:
+                        billed_meters.append(meter)
+                    else:
+                        logger.warning(f"No readings found for meter {meter.meter_id} in period {start_date} to {end_date}")
+                        empty_bills.append(self._create_empty_bill(meter.meter_id, start_date, end_date))
+                
+                # Charges for every billed meter in one vectorized pass
+                consumptions = [consumption_by_meter[meter.meter_id] for meter in billed_meters]
+                charges_batch = self._calculate_charges_vec(
+                    consumptions, pricing, [meter.meter_type for meter in billed_meters]
+                )
+                
+                generated_bills = [
+                    self._format_bill(meter.meter_id, consumptions[index], charges_batch[index], start_date, end_date)
+                    for index, meter in enumerate(billed_meters)
+                ]
+                
+                # Persist all bills with readings in one round-trip
+                self._persist_bills(generated_bills, db)
+                generated_bills.extend(empty_bills)
+            finally:
+                db.close()
+            
+            logger.info(f"Generated {len(generated_bills)} bills")
             
             return {
                 'billing_month': billing_month,
                 'generated_bills': len(generated_bills),
-                'failed_bills': len(failed_bills),
-                'bills': generated_bills,
-                'failures': failed_bills
+                'bills': generated_bills
             }
             
         except Exception as e:
@@ -287,7 +502,7 @@ class BillingService:
         try:
             db = SessionLocal()
             
-            start_date = datetime.utcnow() - timedelta(days=months * 30)
+            start_date = datetime.utcnow() - relativedelta(months=months)
             
             bills = db.query(CustomerBilling).filter(
                 CustomerBilling.meter_id == meter_id,
@@ -3,12 +3,15 @@ Grid Monitoring Service
 Monitors grid health, stability, and performance
 """
 
+import bisect
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import Float, cast, column, func, select, table
 
+from app.core import database
 from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models.smart_meter import EnergyReading
@@ -17,6 +20,44 @@ from app.models.pricing import MarketData
 
 logger = logging.getLogger(__name__)
 
+# Status classification tables: sorted limits and the (status, score) level
+# for each interval between them, so a bisect replaces the if/elif ladders.
+# "At most" limits use bisect_left, "at least" limits use bisect_right.
+_HEALTH_LIMITS = (0.6, 0.7, 0.8, 0.9)  # at least
+_HEALTH_STATUSES = ("critical", "poor", "fair", "good", "excellent")
+
+# Weights of the frequency, voltage, load and renewable scores in overall health
+_HEALTH_WEIGHTS = (0.3, 0.3, 0.25, 0.15)
+
+_FREQUENCY_LIMITS = (0.05, 0.1, 0.2)  # Hz deviation, at most
+_FREQUENCY_LEVELS = (
+    ("stable", 1.0), ("minor_deviation", 0.8), ("moderate_deviation", 0.6), ("unstable", 0.3)
+)
+
+_VOLTAGE_DEVIATION_LIMITS = (0.02, 0.05, 0.1)  # fraction of 230V, at most
+_VOLTAGE_RANGE_LIMITS = (10, 20, 30)  # V spread, at most
+_VOLTAGE_LEVELS = (
+    ("stable", 1.0), ("minor_variation", 0.8), ("moderate_variation", 0.6), ("unstable", 0.3)
+)
+
+_LOAD_LIMITS = (0.7, 0.85, 0.95)  # load factor, at most
+_LOAD_LEVELS = (("normal", 1.0), ("moderate", 0.8), ("high", 0.6), ("critical", 0.2))
+
+_RENEWABLE_LIMITS = (0.1, 0.2, 0.3)  # penetration, at least
+_RENEWABLE_LEVELS = (("low", 0.4), ("moderate", 0.6), ("good", 0.8), ("excellent", 1.0))
+
+# TimescaleDB continuous aggregates created by init_timescaledb()
+_VOLTAGE_1MIN = table(
+    "voltage_1min",
+    column("bucket"), column("sum_voltage"), column("min_voltage"),
+    column("max_voltage"), column("reading_count")
+)
+_POWER_1MIN = table("power_1min", column("bucket"), column("total_power"))
+_RENEWABLE_POWER_1MIN = table(
+    "renewable_power_1min",
+    column("bucket"), column("total_renewable"), column("source_count")
+)
+
 
 class GridMonitoringService:
     """Service for monitoring grid health and stability"""
@@ -43,26 +84,18 @@ class GridMonitoringService:
             )
             
             # Determine overall status
-            if health_score >= 0.9:
-                overall_status = "excellent"
-            elif health_score >= 0.8:
-                overall_status = "good"
-            elif health_score >= 0.7:
-                overall_status = "fair"
-            elif health_score >= 0.6:
-                overall_status = "poor"
-            else:
-                overall_status = "critical"
+            overall_status = _HEALTH_STATUSES[bisect.bisect_right(_HEALTH_LIMITS, health_score)]
             
-            # Generate alerts if needed
+            # Generate alerts if needed, stamped with the report time
+            now = datetime.utcnow()
             alerts = self._generate_alerts(
-                frequency_status, voltage_status, load_status, renewable_status
+                frequency_status, voltage_status, load_status, renewable_status, now
             )
             
             db.close()
             
             health_report = {
-                "timestamp": datetime.utcnow(),
+                "timestamp": now,
                 "overall_status": overall_status,
                 "health_score": round(health_score, 3),
                 "metrics": {
@@ -96,18 +129,7 @@ class GridMonitoringService:
             
             deviation = abs(current_frequency - target_frequency)
             
-            if deviation <= 0.05:
-                status = "stable"
-                score = 1.0
-            elif deviation <= 0.1:
-                status = "minor_deviation"
-                score = 0.8
-            elif deviation <= 0.2:
-                status = "moderate_deviation"
-                score = 0.6
-            else:
-                status = "unstable"
-                score = 0.3
+            status, score = _FREQUENCY_LEVELS[bisect.bisect_left(_FREQUENCY_LIMITS, deviation)]
             
             return {
                 "current_frequency": current_frequency,
@@ -127,15 +149,7 @@ class GridMonitoringService:
             # Get recent voltage readings from smart meters
             recent_time = datetime.utcnow() - timedelta(minutes=30)
             
-            voltage_readings = db.query(
-                func.avg(EnergyReading.voltage_l1).label("avg_voltage"),
-                func.min(EnergyReading.voltage_l1).label("min_voltage"),
-                func.max(EnergyReading.voltage_l1).label("max_voltage"),
-                func.count(EnergyReading.id).label("reading_count")
-            ).filter(
-                EnergyReading.timestamp >= recent_time,
-                EnergyReading.voltage_l1.isnot(None)
-            ).first()
+            voltage_readings = db.execute(self._voltage_select(recent_time)).first()
             
             if not voltage_readings or not voltage_readings.avg_voltage:
                 return {"status": "no_data", "score": 0.5}
@@ -149,18 +163,12 @@ class GridMonitoringService:
             voltage_range = max_voltage - min_voltage
             avg_deviation = abs(avg_voltage - target_voltage) / target_voltage
             
-            if avg_deviation <= 0.02 and voltage_range <= 10:  # 2% deviation, 10V range
-                status = "stable"
-                score = 1.0
-            elif avg_deviation <= 0.05 and voltage_range <= 20:  # 5% deviation, 20V range
-                status = "minor_variation"
-                score = 0.8
-            elif avg_deviation <= 0.1 and voltage_range <= 30:   # 10% deviation, 30V range
-                status = "moderate_variation"
-                score = 0.6
-            else:
-                status = "unstable"
-                score = 0.3
+            # Both deviation and range must be within a level's limits
+            level = max(
+                bisect.bisect_left(_VOLTAGE_DEVIATION_LIMITS, avg_deviation),
+                bisect.bisect_left(_VOLTAGE_RANGE_LIMITS, voltage_range)
+            )
+            status, score = _VOLTAGE_LEVELS[level]
             
             return {
                 "average_voltage": round(avg_voltage, 1),
@@ -170,7 +178,7 @@ class GridMonitoringService:
                 "deviation_percent": round(avg_deviation * 100, 2),
                 "status": status,
                 "score": score,
-                "reading_count": voltage_readings.reading_count
+                "reading_count": int(voltage_readings.reading_count)
             }
             
         except Exception as e:
@@ -183,12 +191,7 @@ class GridMonitoringService:
             # Get current total demand
             recent_time = datetime.utcnow() - timedelta(minutes=15)
             
-            total_demand = db.query(
-                func.sum(EnergyReading.active_power).label("total_power")
-            ).filter(
-                EnergyReading.timestamp >= recent_time,
-                EnergyReading.active_power.isnot(None)
-            ).scalar()
+            total_demand = db.execute(self._demand_select(recent_time)).scalar()
             
             if not total_demand:
                 total_demand = 0
@@ -197,18 +200,7 @@ class GridMonitoringService:
             grid_capacity = 2000.0  # kW
             load_factor = total_demand / grid_capacity if grid_capacity > 0 else 0
             
-            if load_factor <= 0.7:
-                status = "normal"
-                score = 1.0
-            elif load_factor <= 0.85:
-                status = "moderate"
-                score = 0.8
-            elif load_factor <= 0.95:
-                status = "high"
-                score = 0.6
-            else:
-                status = "critical"
-                score = 0.2
+            status, score = _LOAD_LEVELS[bisect.bisect_left(_LOAD_LIMITS, load_factor)]
             
             return {
                 "total_demand_kw": round(float(total_demand), 1),
@@ -229,27 +221,16 @@ class GridMonitoringService:
             # Get recent renewable generation
             recent_time = datetime.utcnow() - timedelta(minutes=15)
             
-            renewable_generation = db.query(
-                func.sum(RenewableEnergyGeneration.power_output_kw).label("total_renewable"),
-                func.count(RenewableEnergyGeneration.id).label("source_count")
-            ).filter(
-                RenewableEnergyGeneration.timestamp >= recent_time
-            ).first()
-            
-            # Get total demand for comparison
-            total_demand = db.query(
-                func.sum(EnergyReading.active_power).label("total_power")
-            ).filter(
-                EnergyReading.timestamp >= recent_time,
-                EnergyReading.active_power.isnot(None)
-            ).scalar()
-            
-            if not renewable_generation or not renewable_generation.total_renewable:
+            # Renewable generation and total demand for comparison, in one round-trip
+            renewable_generation = self._renewable_and_demand(db, recent_time)
+            total_demand = renewable_generation.total_power
+            
+            if not renewable_generation.total_renewable:
                 renewable_power = 0
                 source_count = 0
             else:
                 renewable_power = float(renewable_generation.total_renewable)
-                source_count = renewable_generation.source_count
+                source_count = int(renewable_generation.source_count)
             
             if not total_demand:
                 total_demand = 0
@@ -257,18 +238,7 @@ class GridMonitoringService:
             # Calculate renewable penetration
             renewable_penetration = renewable_power / total_demand if total_demand > 0 else 0
             
-            if renewable_penetration >= 0.3:  # 30% renewable
-                status = "excellent"
-                score = 1.0
-            elif renewable_penetration >= 0.2:  # 20% renewable
-                status = "good"
-                score = 0.8
-            elif renewable_penetration >= 0.1:  # 10% renewable
-                status = "moderate"
-                score = 0.6
-            else:
-                status = "low"
-                score = 0.4
+            status, score = _RENEWABLE_LEVELS[bisect.bisect_right(_RENEWABLE_LIMITS, renewable_penetration)]
             
             return {
                 "renewable_power_kw": round(renewable_power, 1),
@@ -284,26 +254,93 @@ class GridMonitoringService:
             logger.error(f"Error checking renewable integration: {e}")
             return {"status": "error", "score": 0.0}
     
+    def _voltage_select(self, since: datetime):
+        """Voltage avg/min/max/count since a time, from the 1-minute aggregate when available"""
+        if database.timescale_enabled:
+            return select(
+                (func.sum(_VOLTAGE_1MIN.c.sum_voltage) / func.sum(_VOLTAGE_1MIN.c.reading_count)).label("avg_voltage"),
+                func.min(_VOLTAGE_1MIN.c.min_voltage).label("min_voltage"),
+                func.max(_VOLTAGE_1MIN.c.max_voltage).label("max_voltage"),
+                func.sum(_VOLTAGE_1MIN.c.reading_count).label("reading_count")
+            ).where(
+                _VOLTAGE_1MIN.c.bucket >= since
+            )
+        
+        return select(
+            func.avg(EnergyReading.voltage_l1).label("avg_voltage"),
+            func.min(EnergyReading.voltage_l1).label("min_voltage"),
+            func.max(EnergyReading.voltage_l1).label("max_voltage"),
+            func.count(EnergyReading.id).label("reading_count")
+        ).where(
+            EnergyReading.timestamp >= since,
+            EnergyReading.voltage_l1.isnot(None)
+        )
+    
+    def _demand_select(self, since: datetime):
+        """Summed active power since a time, from the 1-minute aggregate when available"""
+        if database.timescale_enabled:
+            return select(
+                func.sum(_POWER_1MIN.c.total_power).label("total_power")
+            ).where(
+                _POWER_1MIN.c.bucket >= since
+            )
+        
+        return select(
+            # REAL column; sum in double precision
+            func.sum(cast(EnergyReading.active_power, Float)).label("total_power")
+        ).where(
+            EnergyReading.timestamp >= since,
+            EnergyReading.active_power.isnot(None)
+        )
+    
+    def _renewable_select(self, since: datetime):
+        """Renewable output and record count since a time, from the 1-minute aggregate when available"""
+        if database.timescale_enabled:
+            return select(
+                func.sum(_RENEWABLE_POWER_1MIN.c.total_renewable).label("total_renewable"),
+                func.sum(_RENEWABLE_POWER_1MIN.c.source_count).label("source_count")
+            ).where(
+                _RENEWABLE_POWER_1MIN.c.bucket >= since
+            )
+        
+        return select(
+            func.sum(RenewableEnergyGeneration.power_output_kw).label("total_renewable"),
+            func.count(RenewableEnergyGeneration.id).label("source_count")
+        ).where(
+            RenewableEnergyGeneration.timestamp >= since
+        )
+    
+    def _renewable_and_demand(self, db: Session, since: datetime):
+        """Renewable aggregates and total demand combined into a single statement"""
+        renewable = self._renewable_select(since).subquery()
+        demand = self._demand_select(since).scalar_subquery()
+        
+        return db.execute(
+            select(
+                renewable.c.total_renewable,
+                renewable.c.source_count,
+                demand.label("total_power")
+            )
+        ).one()
+    
     def _calculate_health_score(self, frequency: Dict, voltage: Dict, load: Dict, renewable: Dict) -> float:
         """Calculate overall grid health score"""
-        weights = {
-            "frequency": 0.3,
-            "voltage": 0.3,
-            "load": 0.25,
-            "renewable": 0.15
-        }
+        frequency_weight, voltage_weight, load_weight, renewable_weight = _HEALTH_WEIGHTS
         
         score = (
-            frequency.get("score", 0) * weights["frequency"] +
-            voltage.get("score", 0) * weights["voltage"] +
-            load.get("score", 0) * weights["load"] +
-            renewable.get("score", 0) * weights["renewable"]
+            frequency.get("score", 0) * frequency_weight +
+            voltage.get("score", 0) * voltage_weight +
+            load.get("score", 0) * load_weight +
+            renewable.get("score", 0) * renewable_weight
         )
         
         return score
     
-    def _generate_alerts(self, frequency: Dict, voltage: Dict, load: Dict, renewable: Dict) -> List[Dict]:
+    def _generate_alerts(self, frequency: Dict, voltage: Dict, load: Dict, renewable: Dict,
+                         now: Optional[datetime] = None) -> List[Dict]:
         """Generate alerts based on grid conditions"""
+        if now is None:
+            now = datetime.utcnow()
         alerts = []
         
         # Frequency alerts
@@ -312,14 +349,14 @@ class GridMonitoringService:
                 "type": "critical",
                 "category": "frequency",
                 "message": f"Grid frequency unstable: {frequency.get('current_frequency', 0)}Hz",
-                "timestamp": datetime.utcnow()
+                "timestamp": now
             })
         elif frequency.get("status") == "moderate_deviation":
             alerts.append({
                 "type": "warning",
                 "category": "frequency",
                 "message": f"Grid frequency deviation detected: {frequency.get('deviation', 0)}Hz",
-                "timestamp": datetime.utcnow()
+                "timestamp": now
             })
         
         # Voltage alerts
@@ -328,7 +365,7 @@ class GridMonitoringService:
                 "type": "critical",
                 "category": "voltage",
                 "message": f"Voltage instability detected: {voltage.get('deviation_percent', 0)}% deviation",
-                "timestamp": datetime.utcnow()
+                "timestamp": now
             })
         
         # Load alerts
@@ -337,14 +374,14 @@ class GridMonitoringService:
                 "type": "critical",
                 "category": "load",
                 "message": f"Grid overload: {load.get('load_factor_percent', 0)}% capacity",
-                "timestamp": datetime.utcnow()
+                "timestamp": now
             })
         elif load.get("status") == "high":
             alerts.append({
                 "type": "warning",
                 "category": "load",
                 "message": f"High grid load: {load.get('load_factor_percent', 0)}% capacity",
-                "timestamp": datetime.utcnow()
+                "timestamp": now
             })
         
         # Renewable alerts
@@ -353,7 +390,7 @@ class GridMonitoringService:
                 "type": "info",
                 "category": "renewable",
                 "message": f"Low renewable penetration: {renewable.get('renewable_penetration_percent', 0)}%",
-                "timestamp": datetime.utcnow()
+                "timestamp": now
             })
         
         return alerts
@@ -364,25 +401,34 @@ class GridMonitoringService:
             # In a real implementation, this would query historical grid data
             # For now, return simulated historical data
             
-            history = []
+            if hours < 1:
+                raise ValueError("hours must be at least 1")
+            
             current_time = datetime.utcnow()
             
-            for i in range(hours):
-                timestamp = current_time - timedelta(hours=i)
-                
-                # Simulate varying grid conditions
-                base_score = 0.85 + (i % 5) * 0.03
-                
+            # Hours ago for each entry, oldest first
+            hours_ago = np.arange(hours - 1, -1, -1)
+            
+            # Simulate varying grid conditions
+            scores = np.round(0.85 + (hours_ago % 5) * 0.03, 3)
+            statuses = np.where(scores >= 0.8, "good", "fair")
+            
+            # One forward pass; tolist() converts the arrays to Python values in C
+            step = timedelta(hours=1)
+            timestamp = current_time - step * (hours - 1)
+            history = []
+            for score, status in zip(scores.tolist(), statuses.tolist()):
                 history.append({
                     "timestamp": timestamp,
-                    "health_score": round(base_score, 3),
-                    "status": "good" if base_score >= 0.8 else "fair"
+                    "health_score": score,
+                    "status": status
                 })
+                timestamp += step
             
             return {
                 "period_hours": hours,
-                "history": list(reversed(history)),
-                "average_score": round(sum(h["health_score"] for h in history) / len(history), 3)
+                "history": history,
+                "average_score": round(float(scores.mean()), 3)
             }
             
         except Exception as e:
@@ -4,20 +4,71 @@ Handles real-time data collection from IoT devices
 """
 
 import asyncio
-import json
 import logging
+import os
+import socket
 from datetime import datetime
-from typing import Dict, Any, Optional
-import paho.mqtt.client as mqtt
-from sqlalchemy.orm import Session
+from functools import partial
+from typing import Dict, Any, List, Optional, Set, Tuple
+import aiomqtt
+import ciso8601
+import orjson
+from sqlalchemy import case, update
+from sqlalchemy.exc import DataError, IntegrityError
 
 from app.core.config import settings
-from app.core.database import SessionLocal
+from app.core.database import SessionLocal, engine
 from app.models.smart_meter import EnergyReading, SmartMeter
 from app.models.renewable_energy import RenewableEnergyGeneration
 
 logger = logging.getLogger(__name__)
 
+# Buffered readings are written every FLUSH_INTERVAL_SECONDS, in inserts of
+# at most FLUSH_BATCH_SIZE rows
+FLUSH_BATCH_SIZE = 500
+FLUSH_INTERVAL_SECONDS = 0.5
+
+# Rows kept for the next flush when a write fails as a whole (e.g. the
+# database restarting); beyond this the oldest are dropped
+MAX_REQUEUED_ROWS = 100 * FLUSH_BATCH_SIZE
+
+# Sensor streams tolerate loss and go at QoS 0 (no PUBACK round-trip);
+# control topics are acknowledged and retained
+_SENSOR_QOS = 0
+_CONTROL_QOS = 1
+_CONTROL_TOPICS = {"grid_status", "pricing"}
+
+# Sensor topics are consumed through an MQTT 5 shared subscription so that
+# backend replicas split the ingest load instead of each receiving everything
+_SHARED_GROUP = "backend"
+
+# Client flow control, sized well above FLUSH_BATCH_SIZE
+MAX_INFLIGHT_MESSAGES = 1000
+MAX_QUEUED_MESSAGES = 100000
+
+# Reconnect backoff after the broker connection drops (doubles up to the max)
+RECONNECT_MIN_DELAY_SECONDS = 1
+RECONNECT_MAX_DELAY_SECONDS = 30
+
+# Core insert statements shared by all flushes (no ORM objects per row)
+_READINGS_INSERT = EnergyReading.__table__.insert()
+_GENERATION_INSERT = RenewableEnergyGeneration.__table__.insert()
+
+# Environmental columns reported by each renewable source type
+_GENERATION_CONDITION_FIELDS = {
+    "solar": ("irradiance_wm2",),
+    "wind": ("wind_speed_ms", "wind_direction_deg")
+}
+_ALL_CONDITION_FIELDS = ("irradiance_wm2", "wind_speed_ms", "wind_direction_deg")
+
+# Naive datetimes in published payloads are UTC; serialize them with a Z suffix
+_ORJSON_PUBLISH_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def _parse_timestamp(value: Optional[str]) -> datetime:
+    """Parse an ISO-8601 payload timestamp, defaulting to now when absent"""
+    return ciso8601.parse_datetime(value) if value else datetime.utcnow()
+
 
 class MQTTService:
     """MQTT service for handling smart meter and renewable energy data"""
@@ -33,31 +84,37 @@ class MQTTService:
             "pricing": "smartgrid/pricing/update"
         }
 
+        # Topic kind (second segment) -> handler
+        self._dispatch = {
+            "meters": self._handle_meter_data,
+            "solar": partial(self._handle_generation_data, "solar"),
+            "wind": partial(self._handle_generation_data, "wind"),
+            "grid": self._handle_grid_status,
+            "pricing": self._handle_pricing_update
+        }
+
+        # Messages are handled on the event loop, so plain lists suffice as
+        # buffers; they are swapped out before each flush
+        self._meter_rows: List[Dict[str, Any]] = []
+        self._generation_rows: List[Dict[str, Any]] = []
+        self._known_meters: Set[str] = set()
+        self._last_seen: Dict[str, datetime] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+
     async def start(self):
         """Start MQTT service"""
         try:
-            # Use the new callback API version for paho-mqtt 2.x
-            self.client = mqtt.Client(
-                client_id="smartgrid_backend",
-                callback_api_version=mqtt.CallbackAPIVersion.VERSION1
-            )
-            self.client.on_connect = self._on_connect
-            self.client.on_disconnect = self._on_disconnect
-            self.client.on_message = self._on_message
-
-            # Set authentication if configured
-            if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
-                self.client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
-
-            # Connect to broker
-            self.client.connect(
-                settings.MQTT_BROKER_HOST,
-                settings.MQTT_BROKER_PORT,
-                settings.MQTT_KEEPALIVE
-            )
+            await asyncio.to_thread(self._load_known_meters)
+
+            self._loop = asyncio.get_running_loop()
 
-            # Start the loop in a separate thread
-            self.client.loop_start()
+            # Receive messages on the event loop, reconnecting as needed
+            self._listener_task = asyncio.create_task(self._listen())
+
+            # Drain buffered readings to the database in the background
+            self._flusher_task = asyncio.create_task(self._flusher())
 
             logger.info(f"MQTT service started, connecting to {settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}")
 
@@ -67,162 +124,266 @@ class MQTTService:
 
     async def stop(self):
         """Stop MQTT service"""
-        if self.client:
-            self.client.loop_stop()
-            self.client.disconnect()
-            logger.info("MQTT service stopped")
-
-    def _on_connect(self, client, userdata, flags, rc):
-        """Callback for when the client receives a CONNACK response"""
-        if rc == 0:
-            self.is_connected = True
-            logger.info("Connected to MQTT broker")
-
-            # Subscribe to all topics
-            for topic_name, topic_pattern in self.topics.items():
-                client.subscribe(topic_pattern)
-                logger.info(f"Subscribed to {topic_name}: {topic_pattern}")
-        else:
-            logger.error(f"Failed to connect to MQTT broker, return code {rc}")
-
-    def _on_disconnect(self, client, userdata, rc):
-        """Callback for when the client disconnects"""
-        self.is_connected = False
-        logger.warning(f"Disconnected from MQTT broker, return code {rc}")
+        for task in (self._listener_task, self._flusher_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
 
-    def _on_message(self, client, userdata, msg):
-        """Callback for when a message is received"""
-        try:
-            topic = msg.topic
-            payload = json.loads(msg.payload.decode())
+        self.client = None
+        self.is_connected = False
 
-            logger.debug(f"Received message on topic {topic}: {payload}")
+        # Persist anything still buffered
+        await self._flush()
+        if self._meter_rows or self._generation_rows:
+            logger.error(
+                f"Lost {len(self._meter_rows)} energy readings and {len(self._generation_rows)} "
+                f"generation records that could not be written before shutdown"
+            )
 
-            # Route message based on topic
-            if "meters" in topic:
-                self._handle_meter_data(topic, payload)
-            elif "solar" in topic:
-                self._handle_solar_data(topic, payload)
-            elif "wind" in topic:
-                self._handle_wind_data(topic, payload)
-            elif "grid/status" in topic:
-                self._handle_grid_status(payload)
-            elif "pricing" in topic:
-                self._handle_pricing_update(payload)
+        logger.info("MQTT service stopped")
 
-        except Exception as e:
-            logger.error(f"Error processing MQTT message: {e}")
+    async def _listen(self):
+        """Connect, subscribe and route incoming messages until cancelled"""
+        # Replicas need distinct client IDs to share a subscription
+        identifier = f"smartgrid_backend_{socket.gethostname()}_{os.getpid()}"
+        reconnect_delay = RECONNECT_MIN_DELAY_SECONDS
 
-    def _handle_meter_data(self, topic: str, payload: Dict[str, Any]):
-        """Handle smart meter data"""
+        while True:
+            try:
+                async with aiomqtt.Client(
+                    settings.MQTT_BROKER_HOST,
+                    settings.MQTT_BROKER_PORT,
+                    username=settings.MQTT_USERNAME,
+                    password=settings.MQTT_PASSWORD,
+                    keepalive=settings.MQTT_KEEPALIVE,
+                    identifier=identifier,
+                    protocol=aiomqtt.ProtocolVersion.V5,
+                    max_inflight_messages=MAX_INFLIGHT_MESSAGES,
+                    max_queued_incoming_messages=MAX_QUEUED_MESSAGES,
+                    max_queued_outgoing_messages=MAX_QUEUED_MESSAGES
+                ) as client:
+                    self.client = client
+                    self.is_connected = True
+                    reconnect_delay = RECONNECT_MIN_DELAY_SECONDS
+                    logger.info("Connected to MQTT broker")
+
+                    # Subscribe to all topics in one request
+                    subscriptions = [self._subscription(name, pattern) for name, pattern in self.topics.items()]
+                    await client.subscribe(subscriptions)
+                    logger.info(f"Subscribed to {', '.join(pattern for pattern, _ in subscriptions)}")
+
+                    async for message in client.messages:
+                        await self._on_message(message)
+
+            except aiomqtt.MqttError as e:
+                logger.warning(f"Disconnected from MQTT broker: {e}")
+            finally:
+                self.client = None
+                self.is_connected = False
+
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, RECONNECT_MAX_DELAY_SECONDS)
+
+    @staticmethod
+    def _subscription(topic_name: str, topic_pattern: str) -> Tuple[str, int]:
+        """Topic filter and QoS for a topic; sensor streams use the shared group"""
+        if topic_name in _CONTROL_TOPICS:
+            return topic_pattern, _CONTROL_QOS
+        return f"$share/{_SHARED_GROUP}/{topic_pattern}", _SENSOR_QOS
+
+    def _load_known_meters(self):
+        """Cache registered meter IDs so ingest needs no per-message lookup"""
+        db = SessionLocal()
         try:
-            # Extract meter ID from topic: smartgrid/meters/{meter_id}/data
-            meter_id = topic.split('/')[2]
-
-            db = SessionLocal()
+            self._known_meters = {row.meter_id for row in db.query(SmartMeter.meter_id)}
+            logger.info(f"Loaded {len(self._known_meters)} known meters")
+        finally:
+            db.close()
+
+    async def _flusher(self):
+        """Periodically write buffered readings in batches"""
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
             try:
-                # Verify meter exists
-                meter = db.query(SmartMeter).filter(SmartMeter.meter_id == meter_id).first()
-                if not meter:
-                    logger.warning(f"Unknown meter ID: {meter_id}")
-                    return
-
-                # Create energy reading
-                reading = EnergyReading(
-                    meter_id=meter_id,
-                    timestamp=datetime.fromisoformat(payload.get('timestamp', datetime.utcnow().isoformat())),
-                    active_energy=payload.get('active_energy'),
-                    reactive_energy=payload.get('reactive_energy'),
-                    apparent_energy=payload.get('apparent_energy'),
-                    active_power=payload.get('active_power'),
-                    reactive_power=payload.get('reactive_power'),
-                    power_factor=payload.get('power_factor'),
-                    voltage_l1=payload.get('voltage_l1'),
-                    voltage_l2=payload.get('voltage_l2'),
-                    voltage_l3=payload.get('voltage_l3'),
-                    current_l1=payload.get('current_l1'),
-                    current_l2=payload.get('current_l2'),
-                    current_l3=payload.get('current_l3'),
-                    frequency=payload.get('frequency'),
-                    quality_flag=payload.get('quality_flag', 'good')
-                )
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Error flushing MQTT buffers: {e}")
 
-                db.add(reading)
+    async def _flush(self):
+        """Hand the current buffers to a worker thread for writing"""
+        meter_rows, self._meter_rows = self._meter_rows, []
+        generation_rows, self._generation_rows = self._generation_rows, []
+        last_seen, self._last_seen = self._last_seen, {}
 
-                # Update meter last communication
-                meter.last_communication = datetime.utcnow()
-
-                db.commit()
-                logger.debug(f"Stored energy reading for meter {meter_id}")
-
-            finally:
-                db.close()
+        if not meter_rows and not generation_rows and not last_seen:
+            return
 
+        try:
+            await asyncio.to_thread(self._write_batch, meter_rows, generation_rows, last_seen)
         except Exception as e:
-            logger.error(f"Error handling meter data: {e}")
+            logger.error(f"Error writing buffered MQTT data: {e}")
+            self._requeue(meter_rows, generation_rows, last_seen)
+
+    def _requeue(self, meter_rows: List[Dict[str, Any]], generation_rows: List[Dict[str, Any]],
+                 last_seen: Dict[str, datetime]):
+        """Put an unwritten batch back in front of the buffers for the next flush"""
+        self._meter_rows = meter_rows + self._meter_rows
+        self._generation_rows = generation_rows + self._generation_rows
+        last_seen.update(self._last_seen)
+        self._last_seen = last_seen
+
+        dropped_meter = max(0, len(self._meter_rows) - MAX_REQUEUED_ROWS)
+        dropped_generation = max(0, len(self._generation_rows) - MAX_REQUEUED_ROWS)
+        if dropped_meter or dropped_generation:
+            del self._meter_rows[:dropped_meter]
+            del self._generation_rows[:dropped_generation]
+            logger.warning(
+                f"Dropped {dropped_meter} energy readings and {dropped_generation} generation records "
+                f"over the requeue limit"
+            )
+        logger.warning(
+            f"Requeued {len(self._meter_rows)} energy readings and {len(self._generation_rows)} "
+            f"generation records for the next flush"
+        )
+
+    def _write_batch(self, meter_rows: List[Dict[str, Any]], generation_rows: List[Dict[str, Any]],
+                     last_seen: Dict[str, datetime]):
+        """Write buffered readings in a single transaction (raises if it fails as a whole)"""
+        meters_table = SmartMeter.__table__
+
+        # Rows from cached meters can be written in bulk; the rest are checked
+        # one at a time by the foreign key
+        known_rows = [row for row in meter_rows if row['meter_id'] in self._known_meters]
+        unchecked_rows = [row for row in meter_rows if row['meter_id'] not in self._known_meters]
+
+        # Core executemany on one connection; bypasses the ORM unit of work
+        with engine.begin() as conn:
+            self._insert_chunks(conn, _READINGS_INSERT, known_rows, 'meter_id')
+            for row in unchecked_rows:
+                if self._insert_row(conn, _READINGS_INSERT, row, 'meter_id'):
+                    self._known_meters.add(row['meter_id'])
+            self._insert_chunks(conn, _GENERATION_INSERT, generation_rows, 'source_id')
+
+            # Coalesce last-communication updates into one statement per flush
+            if last_seen:
+                conn.execute(
+                    update(meters_table)
+                    .where(meters_table.c.meter_id.in_(last_seen))
+                    .values(last_communication=case(last_seen, value=meters_table.c.meter_id))
+                )
 
-    def _handle_solar_data(self, topic: str, payload: Dict[str, Any]):
-        """Handle solar panel data"""
-        try:
-            # Extract panel ID from topic: smartgrid/solar/{panel_id}/data
-            panel_id = topic.split('/')[2]
+        logger.debug(
+            f"Flushed {len(meter_rows)} energy readings and {len(generation_rows)} generation records"
+        )
 
-            db = SessionLocal()
+    def _insert_chunks(self, conn, statement, rows: List[Dict[str, Any]], id_field: str):
+        """Insert rows in FLUSH_BATCH_SIZE chunks, each under a savepoint
+
+        A chunk the database rejects is retried row by row, so a bad row
+        drops only itself rather than the whole flush.
+        """
+        for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+            chunk = rows[start:start + FLUSH_BATCH_SIZE]
             try:
-                generation = RenewableEnergyGeneration(
-                    source_id=panel_id,
-                    source_type="solar",
-                    timestamp=datetime.fromisoformat(payload.get('timestamp', datetime.utcnow().isoformat())),
-                    power_output_kw=payload.get('power_output_kw'),
-                    energy_generated_kwh=payload.get('energy_generated_kwh'),
-                    irradiance_wm2=payload.get('irradiance_wm2'),
-                    temperature_c=payload.get('temperature_c'),
-                    capacity_factor=payload.get('capacity_factor'),
-                    efficiency=payload.get('efficiency')
-                )
+                with conn.begin_nested():
+                    conn.execute(statement, chunk)
+            except (IntegrityError, DataError):
+                for row in chunk:
+                    self._insert_row(conn, statement, row, id_field)
+
+    @staticmethod
+    def _insert_row(conn, statement, row: Dict[str, Any], id_field: str) -> bool:
+        """Insert one row under a savepoint; log and skip it if the database rejects it"""
+        try:
+            with conn.begin_nested():
+                conn.execute(statement, row)
+            return True
+        except (IntegrityError, DataError) as e:
+            logger.warning(f"Rejected row for {id_field} {row.get(id_field)}: {e.orig}")
+            return False
+
+    async def _on_message(self, msg: aiomqtt.Message):
+        """Handle a message received from the broker"""
+        try:
+            topic = msg.topic.value
+            payload = orjson.loads(msg.payload)
 
-                db.add(generation)
-                db.commit()
-                logger.debug(f"Stored solar generation data for panel {panel_id}")
+            logger.debug(f"Received message on topic {topic}: {payload}")
 
-            finally:
-                db.close()
+            # Route message on the second topic segment: smartgrid/{kind}/...
+            parts = topic.split('/', 3)
+            handler = self._dispatch.get(parts[1]) if len(parts) > 1 else None
+            if handler:
+                handler(topic, payload)
 
         except Exception as e:
-            logger.error(f"Error handling solar data: {e}")
+            logger.error(f"Error processing MQTT message: {e}")
 
-    def _handle_wind_data(self, topic: str, payload: Dict[str, Any]):
-        """Handle wind turbine data"""
+    def _handle_meter_data(self, topic: str, payload: Dict[str, Any]):
+        """Handle smart meter data"""
         try:
-            # Extract turbine ID from topic: smartgrid/wind/{turbine_id}/data
-            turbine_id = topic.split('/')[2]
+            # Extract meter ID from topic: smartgrid/meters/{meter_id}/data
+            meter_id = topic.split('/')[2]
 
-            db = SessionLocal()
-            try:
-                generation = RenewableEnergyGeneration(
-                    source_id=turbine_id,
-                    source_type="wind",
-                    timestamp=datetime.fromisoformat(payload.get('timestamp', datetime.utcnow().isoformat())),
-                    power_output_kw=payload.get('power_output_kw'),
-                    energy_generated_kwh=payload.get('energy_generated_kwh'),
-                    wind_speed_ms=payload.get('wind_speed_ms'),
-                    wind_direction_deg=payload.get('wind_direction_deg'),
-                    temperature_c=payload.get('temperature_c'),
-                    capacity_factor=payload.get('capacity_factor'),
-                    efficiency=payload.get('efficiency')
-                )
+            # Unknown meters are rejected by the foreign key when the batch is written
+            self._meter_rows.append({
+                'meter_id': meter_id,
+                'timestamp': _parse_timestamp(payload.get('timestamp')),
+                'active_energy': payload.get('active_energy'),
+                'reactive_energy': payload.get('reactive_energy'),
+                'apparent_energy': payload.get('apparent_energy'),
+                'active_power': payload.get('active_power'),
+                'reactive_power': payload.get('reactive_power'),
+                'power_factor': payload.get('power_factor'),
+                'voltage_l1': payload.get('voltage_l1'),
+                'voltage_l2': payload.get('voltage_l2'),
+                'voltage_l3': payload.get('voltage_l3'),
+                'current_l1': payload.get('current_l1'),
+                'current_l2': payload.get('current_l2'),
+                'current_l3': payload.get('current_l3'),
+                'frequency': payload.get('frequency'),
+                'quality_flag': payload.get('quality_flag', 'good')
+            })
+
+            # Update meter last communication (written on the next flush)
+            self._last_seen[meter_id] = datetime.utcnow()
+            logger.debug(f"Buffered energy reading for meter {meter_id}")
 
-                db.add(generation)
-                db.commit()
-                logger.debug(f"Stored wind generation data for turbine {turbine_id}")
+        except Exception as e:
+            logger.error(f"Error handling meter data: {e}")
 
-            finally:
-                db.close()
+    def _handle_generation_data(self, source_type: str, topic: str, payload: Dict[str, Any]):
+        """Handle solar panel or wind turbine data"""
+        try:
+            # Extract source ID from topic: smartgrid/{solar|wind}/{source_id}/data
+            source_id = topic.split('/')[2]
+
+            # Every row carries all columns (unused ones as None) so a batch
+            # mixing solar and wind rows is one executemany
+            conditions = _GENERATION_CONDITION_FIELDS[source_type]
+            row = {
+                'source_id': source_id,
+                'source_type': source_type,
+                'timestamp': _parse_timestamp(payload.get('timestamp')),
+                'power_output_kw': payload.get('power_output_kw'),
+                'energy_generated_kwh': payload.get('energy_generated_kwh'),
+                'temperature_c': payload.get('temperature_c'),
+                'capacity_factor': payload.get('capacity_factor'),
+                'efficiency': payload.get('efficiency')
+            }
+            for field in _ALL_CONDITION_FIELDS:
+                row[field] = payload.get(field) if field in conditions else None
+
+            self._generation_rows.append(row)
+            logger.debug(f"Buffered {source_type} generation data for {source_id}")
 
         except Exception as e:
-            logger.error(f"Error handling wind data: {e}")
+            logger.error(f"Error handling {source_type} data: {e}")
 
-    def _handle_grid_status(self, payload: Dict[str, Any]):
+    def _handle_grid_status(self, topic: str, payload: Dict[str, Any]):
         """Handle grid status updates"""
         try:
             # Log grid status for monitoring
@@ -234,7 +395,7 @@ class MQTTService:
         except Exception as e:
             logger.error(f"Error handling grid status: {e}")
 
-    def _handle_pricing_update(self, payload: Dict[str, Any]):
+    def _handle_pricing_update(self, topic: str, payload: Dict[str, Any]):
         """Handle pricing updates"""
         try:
             # Log pricing updates
@@ -246,12 +407,13 @@ class MQTTService:
         except Exception as e:
             logger.error(f"Error handling pricing update: {e}")
 
-    def publish_message(self, topic: str, payload: Dict[str, Any]):
+    def publish_message(self, topic: str, payload: Dict[str, Any], qos: int = _SENSOR_QOS, retain: bool = False):
         """Publish a message to MQTT broker"""
         try:
             if self.client and self.is_connected:
-                message = json.dumps(payload)
-                self.client.publish(topic, message)
+                message = orjson.dumps(payload, option=_ORJSON_PUBLISH_OPTIONS)
+                # Safe from any thread; the publish runs on the service's event loop
+                asyncio.run_coroutine_threadsafe(self.client.publish(topic, message, qos=qos, retain=retain), self._loop)
                 logger.debug(f"Published message to {topic}: {payload}")
             else:
                 logger.warning("Cannot publish message: MQTT client not connected")
@@ -260,8 +422,8 @@ class MQTTService:
 
     def publish_pricing_update(self, pricing_data: Dict[str, Any]):
         """Publish pricing update to all subscribers"""
-        self.publish_message("smartgrid/pricing/update", pricing_data)
+        self.publish_message("smartgrid/pricing/update", pricing_data, qos=_CONTROL_QOS, retain=True)
 
     def publish_grid_alert(self, alert_data: Dict[str, Any]):
         """Publish grid alert"""
-        self.publish_message("smartgrid/grid/alert", alert_data)
+        self.publish_message("smartgrid/grid/alert", alert_data, qos=_CONTROL_QOS, retain=True)
@@ -3,21 +3,166 @@ Dynamic Pricing Optimization Service
 Implements advanced algorithms for optimal energy pricing
 """
 
+import hashlib
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import bindparam, insert, select, text
 
 from app.core.config import settings
 from app.core.database import SessionLocal
-from app.models.pricing import EnergyPrice, DynamicPricing, MarketData
-from app.models.smart_meter import EnergyReading, EnergyPrediction
-from app.models.renewable_energy import RenewableForecast
+from app.models.pricing import DynamicPricing, MarketData
 
 logger = logging.getLogger(__name__)
 
+# Time-of-use tiers, indexed by hour of day:
+# 0-6 off-peak, 7-16 standard, 17-21 peak, 22-23 off-peak
+_OFF_PEAK, _STANDARD, _PEAK = 0, 1, 2
+_HOUR_TIER = np.array([_OFF_PEAK] * 7 + [_STANDARD] * 10 + [_PEAK] * 5 + [_OFF_PEAK] * 2)
+_TIER_NAMES = ("off_peak", "standard", "peak")
+
+# Default demand per tier when there are no predictions (kW)
+_DEFAULT_DEMAND_KW = np.array([600.0, 900.0, 1200.0])
+
+# Hours covered by one optimization run
+_OPTIMIZATION_HOURS = 24
+
+# One record per target hour of an optimization run
+_PRICE_DTYPE = np.dtype([
+    ("target_timestamp", "datetime64[us]"),
+    ("optimized_price", "f8"),
+    ("adjustment_factor", "f8"),
+    ("predicted_demand", "f8"),
+    ("predicted_supply", "f8"),
+    ("renewable_generation", "f8"),
+    ("supply_demand_ratio", "f8"),
+    ("supply_adjustment", "f8"),
+    ("time_adjustment", "f8"),
+    ("renewable_adjustment", "f8"),
+    ("stability_adjustment", "f8")
+])
+
+# Decimal places kept per field
+_PRICE_ROUNDING = {
+    "optimized_price": 4,
+    "adjustment_factor": 3,
+    "supply_demand_ratio": 3,
+    "supply_adjustment": 3,
+    "time_adjustment": 3,
+    "renewable_adjustment": 3,
+    "stability_adjustment": 3
+}
+
+# Statements run on every optimization or price request, built once so each
+# execution reuses SQLAlchemy's compiled-statement cache entry
+_LATEST_MARKET_STMT = select(MarketData).order_by(MarketData.timestamp.desc()).limit(1)
+
+_CURRENT_PRICE_STMT = select(DynamicPricing.optimized_price_kwh).where(
+    DynamicPricing.target_timestamp.between(bindparam("start"), bindparam("end"))
+).order_by(DynamicPricing.target_timestamp.asc()).limit(1)
+
+_PRICE_FORECAST_STMT = select(
+    DynamicPricing.target_timestamp,
+    DynamicPricing.optimized_price_kwh,
+    DynamicPricing.price_adjustment_factor,
+    DynamicPricing.predicted_demand_kw,
+    DynamicPricing.renewable_generation_kw
+).where(
+    DynamicPricing.target_timestamp.between(bindparam("start"), bindparam("end"))
+).order_by(DynamicPricing.target_timestamp.asc())
+
+# One row per target hour: the closest demand prediction in the window
+# (ties go to the earlier one), NULL when the window has no predictions
+_NEAREST_DEMAND_SQL = text("""
+    WITH hours AS (
+        SELECT generate_series(
+            CAST(:start AS timestamp),
+            CAST(:start AS timestamp) + (:hours - 1) * interval '1 hour',
+            interval '1 hour'
+        ) AS ts
+    )
+    SELECT hours.ts, nearest.predicted_consumption
+    FROM hours
+    LEFT JOIN LATERAL (
+        SELECT p.predicted_consumption
+        FROM energy_predictions p
+        WHERE p.target_timestamp BETWEEN :start AND :end
+        ORDER BY abs(extract(epoch FROM p.target_timestamp - hours.ts)), p.target_timestamp
+        LIMIT 1
+    ) nearest ON true
+    ORDER BY hours.ts
+""")
+
+# One row per target hour: total renewable forecast within 30 minutes of it
+_HOURLY_RENEWABLE_SQL = text("""
+    WITH hours AS (
+        SELECT generate_series(
+            CAST(:start AS timestamp),
+            CAST(:start AS timestamp) + (:hours - 1) * interval '1 hour',
+            interval '1 hour'
+        ) AS ts
+    )
+    SELECT hours.ts, coalesce(sum(f.predicted_power_kw), 0) AS predicted_power_kw
+    FROM hours
+    LEFT JOIN renewable_forecasts f
+        ON f.target_timestamp >= hours.ts - interval '30 minutes'
+        AND f.target_timestamp < hours.ts + interval '30 minutes'
+        AND f.target_timestamp BETWEEN :start AND :end
+    GROUP BY hours.ts
+    ORDER BY hours.ts
+""")
+
+
+def _calc_prices_kernel(hours: np.ndarray, demand: np.ndarray, renewable: np.ndarray,
+                        supply_base: float, base_price: float, hour_multipliers: np.ndarray,
+                        grid_frequency: float) -> Dict[str, np.ndarray]:
+    """Price arithmetic for a series of hours, as whole-array operations"""
+    demand = np.maximum(demand, 1)
+    
+    # Supply-demand ratio
+    total_supply = supply_base + renewable
+    supply_demand_ratio = total_supply / demand
+    
+    # Price adjustment based on supply-demand: oversupply, undersupply, balanced.
+    # The bands are disjoint, so each mask adds its offset from the balanced 1.0
+    oversupply = supply_demand_ratio > 1.2
+    undersupply = supply_demand_ratio < 0.9
+    supply_adjustment = 1.0 - 0.2 * oversupply + 0.3 * undersupply
+    
+    # Time-of-use adjustment: peak, off-peak, normal hours
+    time_adjustment = hour_multipliers[hours]
+    
+    # Renewable energy bonus (lower prices when more renewable), computed
+    # in the ratio's buffer instead of a temporary per operation
+    renewable_adjustment = renewable / demand
+    renewable_adjustment *= -0.3
+    renewable_adjustment += 1
+    np.maximum(renewable_adjustment, 0.7, out=renewable_adjustment)
+    
+    # Grid stability factor
+    stability_adjustment = 1 + abs(grid_frequency - 50.0) * 0.02
+    
+    # Final optimized price, within reasonable bounds; one buffer, multiplied in place
+    price = np.multiply(supply_adjustment, time_adjustment)
+    price *= renewable_adjustment
+    price *= base_price * stability_adjustment
+    np.clip(price, base_price * 0.5, base_price * 2.0, out=price)
+    
+    return {
+        "optimized_price": price,
+        "total_supply": total_supply,
+        "supply_demand_ratio": supply_demand_ratio,
+        "supply_adjustment": supply_adjustment,
+        "time_adjustment": time_adjustment,
+        "renewable_adjustment": renewable_adjustment,
+        "stability_adjustment": stability_adjustment
+    }
+
 
 class PricingService:
     """Service for dynamic pricing optimization"""
@@ -26,55 +171,84 @@ class PricingService:
         self.base_price = settings.BASE_ENERGY_PRICE
         self.peak_multiplier = settings.PEAK_HOUR_MULTIPLIER
         self.off_peak_multiplier = settings.OFF_PEAK_MULTIPLIER
+        
+        # Price multiplier per tier, and per hour of day via the tier table
+        self.tier_multipliers = np.array([self.off_peak_multiplier, 1.0, self.peak_multiplier])
+        self.hour_multipliers = self.tier_multipliers[_HOUR_TIER]
+        
+        # Current optimized price and when it was fetched (see get_current_price)
+        self._price_cache: Tuple[float, Optional[float]] = (0.0, None)
+        self._price_lock = threading.Lock()
+        
+        # Digest of the inputs behind the last stored optimization (see optimize_pricing)
+        self._last_state_hash: Optional[bytes] = None
     
     def optimize_pricing(self):
         """Run dynamic pricing optimization"""
         try:
-            db = SessionLocal()
-            
-            # Get current market conditions
-            market_data = self._get_current_market_data(db)
-            
-            # Get demand predictions for next 24 hours
-            demand_predictions = self._get_demand_predictions(db)
-            
-            # Get renewable energy forecasts
-            renewable_forecasts = self._get_renewable_forecasts(db)
-            
-            # Calculate optimal pricing for each hour
-            optimized_prices = []
-            
-            for hour_offset in range(24):
-                target_time = datetime.utcnow() + timedelta(hours=hour_offset)
-                
-                # Get predicted demand and supply for this hour
-                predicted_demand = self._get_predicted_demand_for_hour(demand_predictions, target_time)
-                predicted_renewable = self._get_predicted_renewable_for_hour(renewable_forecasts, target_time)
-                
-                # Calculate optimal price
-                optimal_price = self._calculate_optimal_price(
-                    target_time=target_time,
-                    predicted_demand=predicted_demand,
-                    predicted_renewable=predicted_renewable,
-                    market_data=market_data
-                )
-                
-                optimized_prices.append(optimal_price)
+            # One reference instant for the whole run
+            now = datetime.utcnow()
+            
+            # Market conditions, demand predictions and renewable forecasts are
+            # independent queries; run them concurrently on separate sessions
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                market_future = executor.submit(self._with_session, self._get_current_market_data)
+                demand_future = executor.submit(self._with_session, self._get_demand_predictions, now)
+                renewable_future = executor.submit(self._with_session, self._get_renewable_forecasts, now)
+            
+            market_data = market_future.result()
+            demand_predictions = demand_future.result()
+            renewable_forecasts = renewable_future.result()
+            
+            # Skip the run when nothing changed since the last stored one. The
+            # current hour is part of the state, so the stored 24-hour horizon
+            # still moves forward at least hourly.
+            state_hash = self._state_hash(now, market_data, demand_predictions, renewable_forecasts)
+            if state_hash == self._last_state_hash:
+                logger.info("Pricing inputs unchanged, skipping optimization")
+                return
+            
+            # Target times for the next 24 hours
+            target_times = [now + timedelta(hours=hour_offset) for hour_offset in range(_OPTIMIZATION_HOURS)]
+            
+            # Calculate optimal pricing for all hours at once
+            optimized_prices = self._calculate_optimal_prices(
+                target_times=target_times,
+                predicted_demand=demand_predictions,
+                predicted_renewable=renewable_forecasts,
+                market_data=market_data
+            )
             
             # Store optimization results
-            self._store_pricing_results(db, optimized_prices)
+            if self._with_session(self._store_pricing_results, optimized_prices, now):
+                self._last_state_hash = state_hash
             
-            db.close()
             logger.info("Dynamic pricing optimization completed")
             
         except Exception as e:
             logger.error(f"Error in pricing optimization: {e}")
     
+    @staticmethod
+    def _state_hash(now: datetime, market_data: Optional[Dict], demand: np.ndarray,
+                    renewable: np.ndarray) -> bytes:
+        """Digest of the pricing inputs for one run"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((now.replace(minute=0, second=0, microsecond=0), market_data)).encode())
+        digest.update(demand.tobytes())
+        digest.update(renewable.tobytes())
+        return digest.digest()
+    
+    @staticmethod
+    def _with_session(func, *args):
+        """Call func with a fresh session as its first argument, closing it afterwards"""
+        with SessionLocal() as db:
+            return func(db, *args)
+    
     def _get_current_market_data(self, db: Session) -> Optional[Dict]:
         """Get current market conditions"""
         try:
             # Get latest market data
-            latest_market = db.query(MarketData).order_by(MarketData.timestamp.desc()).first()
+            latest_market = db.scalars(_LATEST_MARKET_STMT).first()
             
             if latest_market:
                 return {
@@ -98,218 +272,126 @@ class PricingService:
             logger.error(f"Error getting market data: {e}")
             return None
     
-    def _get_demand_predictions(self, db: Session) -> List[Dict]:
-        """Get energy demand predictions for next 24 hours"""
+    def _get_demand_predictions(self, db: Session, now: datetime) -> np.ndarray:
+        """Get predicted energy demand for each of the next 24 hours"""
+        hours = np.arange(now.hour, now.hour + _OPTIMIZATION_HOURS) % 24
+        default_demand = _DEFAULT_DEMAND_KW[_HOUR_TIER[hours]]
+        
         try:
-            start_time = datetime.utcnow()
-            end_time = start_time + timedelta(hours=24)
+            # Nearest prediction per hour is picked in SQL, so exactly 24 rows come back
+            rows = db.execute(_NEAREST_DEMAND_SQL, {
+                "start": now,
+                "end": now + timedelta(hours=24),
+                "hours": _OPTIMIZATION_HOURS
+            }).all()
             
-            predictions = db.query(EnergyPrediction).filter(
-                EnergyPrediction.target_timestamp >= start_time,
-                EnergyPrediction.target_timestamp <= end_time
-            ).all()
+            consumption = np.array([row.predicted_consumption for row in rows], dtype=float)
             
-            return [
-                {
-                    "timestamp": pred.target_timestamp,
-                    "predicted_consumption": pred.predicted_consumption,
-                    "confidence_lower": pred.confidence_interval_lower,
-                    "confidence_upper": pred.confidence_interval_upper
-                }
-                for pred in predictions
-            ]
+            # Without any predictions, fall back to default demand based on time of day
+            return np.where(np.isnan(consumption), default_demand, consumption)
             
         except Exception as e:
             logger.error(f"Error getting demand predictions: {e}")
-            return []
+            return default_demand
     
-    def _get_renewable_forecasts(self, db: Session) -> List[Dict]:
-        """Get renewable energy forecasts for next 24 hours"""
+    def _get_renewable_forecasts(self, db: Session, now: datetime) -> np.ndarray:
+        """Get predicted renewable generation for each of the next 24 hours"""
         try:
-            start_time = datetime.utcnow()
-            end_time = start_time + timedelta(hours=24)
+            rows = db.execute(_HOURLY_RENEWABLE_SQL, {
+                "start": now,
+                "end": now + timedelta(hours=24),
+                "hours": _OPTIMIZATION_HOURS
+            }).all()
             
-            forecasts = db.query(RenewableForecast).filter(
-                RenewableForecast.target_timestamp >= start_time,
-                RenewableForecast.target_timestamp <= end_time
-            ).all()
-            
-            return [
-                {
-                    "timestamp": forecast.target_timestamp,
-                    "source_type": forecast.source_type,
-                    "predicted_power": forecast.predicted_power_kw,
-                    "predicted_energy": forecast.predicted_energy_kwh
-                }
-                for forecast in forecasts
-            ]
+            return np.array([row.predicted_power_kw for row in rows], dtype=float)
             
         except Exception as e:
             logger.error(f"Error getting renewable forecasts: {e}")
-            return []
+            return np.zeros(_OPTIMIZATION_HOURS)
     
-    def _get_predicted_demand_for_hour(self, predictions: List[Dict], target_time: datetime) -> float:
-        """Get predicted demand for a specific hour"""
-        # Find prediction closest to target time
-        closest_prediction = None
-        min_time_diff = float('inf')
-        
-        for pred in predictions:
-            time_diff = abs((pred["timestamp"] - target_time).total_seconds())
-            if time_diff < min_time_diff:
-                min_time_diff = time_diff
-                closest_prediction = pred
+    def _calculate_optimal_prices(self, target_times: List[datetime], predicted_demand: np.ndarray,
+                                  predicted_renewable: np.ndarray, market_data: Dict) -> np.ndarray:
+        """Calculate optimal prices for a series of hours using supply-demand optimization"""
+        prices = np.zeros(len(target_times), dtype=_PRICE_DTYPE)
+        prices["target_timestamp"] = target_times
+        prices["predicted_demand"] = predicted_demand
+        prices["renewable_generation"] = predicted_renewable
         
-        if closest_prediction:
-            return closest_prediction["predicted_consumption"]
-        else:
-            # Default demand based on time of day
-            hour = target_time.hour
-            if 17 <= hour <= 21:  # Peak hours
-                return 1200  # kW
-            elif 22 <= hour <= 6:  # Off-peak hours
-                return 600   # kW
-            else:  # Normal hours
-                return 900   # kW
-    
-    def _get_predicted_renewable_for_hour(self, forecasts: List[Dict], target_time: datetime) -> float:
-        """Get predicted renewable generation for a specific hour"""
-        total_renewable = 0
-        
-        for forecast in forecasts:
-            time_diff = abs((forecast["timestamp"] - target_time).total_seconds())
-            if time_diff <= 1800:  # Within 30 minutes
-                total_renewable += forecast["predicted_power"]
-        
-        return total_renewable
-    
-    def _calculate_optimal_price(self, target_time: datetime, predicted_demand: float, 
-                               predicted_renewable: float, market_data: Dict) -> Dict:
-        """Calculate optimal price using supply-demand optimization"""
         try:
             # Base price from market conditions
             base_price = market_data["wholesale_price"]
             
-            # Supply-demand ratio
-            total_supply = market_data["total_supply"] + predicted_renewable
-            supply_demand_ratio = total_supply / max(predicted_demand, 1)
-            
-            # Price adjustment based on supply-demand
-            if supply_demand_ratio > 1.2:  # Oversupply
-                supply_adjustment = 0.8
-            elif supply_demand_ratio < 0.9:  # Undersupply
-                supply_adjustment = 1.3
-            else:  # Balanced
-                supply_adjustment = 1.0
-            
-            # Time-of-use adjustment
-            hour = target_time.hour
-            if 17 <= hour <= 21:  # Peak hours
-                time_adjustment = self.peak_multiplier
-            elif 22 <= hour <= 6:  # Off-peak hours
-                time_adjustment = self.off_peak_multiplier
-            else:  # Normal hours
-                time_adjustment = 1.0
+            # Hour of day from integer datetime64 arithmetic, not per-datetime attributes
+            hours = prices["target_timestamp"].astype("datetime64[h]").astype(np.int64) % 24
             
-            # Renewable energy bonus (lower prices when more renewable)
-            renewable_ratio = predicted_renewable / max(predicted_demand, 1)
-            renewable_adjustment = max(0.7, 1 - (renewable_ratio * 0.3))
+            kernel = _calc_prices_kernel(
+                hours, predicted_demand, predicted_renewable, market_data["total_supply"],
+                base_price, self.hour_multipliers, market_data["grid_frequency"]
+            )
             
-            # Grid stability factor
-            frequency_deviation = abs(market_data["grid_frequency"] - 50.0)
-            stability_adjustment = 1 + (frequency_deviation * 0.02)
+            prices["optimized_price"] = kernel["optimized_price"]
+            prices["adjustment_factor"] = kernel["optimized_price"] / base_price
+            prices["predicted_supply"] = kernel["total_supply"]
+            prices["supply_demand_ratio"] = kernel["supply_demand_ratio"]
+            prices["supply_adjustment"] = kernel["supply_adjustment"]
+            prices["time_adjustment"] = kernel["time_adjustment"]
+            prices["renewable_adjustment"] = kernel["renewable_adjustment"]
+            prices["stability_adjustment"] = kernel["stability_adjustment"]
             
-            # Calculate final optimized price
-            optimized_price = (base_price * 
-                             supply_adjustment * 
-                             time_adjustment * 
-                             renewable_adjustment * 
-                             stability_adjustment)
-            
-            # Ensure price is within reasonable bounds
-            min_price = base_price * 0.5
-            max_price = base_price * 2.0
-            optimized_price = max(min_price, min(max_price, optimized_price))
-            
-            # Calculate adjustment factor
-            adjustment_factor = optimized_price / base_price
-            
-            return {
-                "target_timestamp": target_time,
-                "optimized_price": round(optimized_price, 4),
-                "adjustment_factor": round(adjustment_factor, 3),
-                "predicted_demand": predicted_demand,
-                "predicted_supply": total_supply,
-                "renewable_generation": predicted_renewable,
-                "supply_demand_ratio": round(supply_demand_ratio, 3),
-                "optimization_factors": {
-                    "supply_adjustment": round(supply_adjustment, 3),
-                    "time_adjustment": round(time_adjustment, 3),
-                    "renewable_adjustment": round(renewable_adjustment, 3),
-                    "stability_adjustment": round(stability_adjustment, 3)
-                }
-            }
+            for field, decimals in _PRICE_ROUNDING.items():
+                np.round(prices[field], decimals, out=prices[field])
             
         except Exception as e:
-            logger.error(f"Error calculating optimal price: {e}")
-            return {
-                "target_timestamp": target_time,
-                "optimized_price": base_price,
-                "adjustment_factor": 1.0,
-                "predicted_demand": predicted_demand,
-                "predicted_supply": 0,
-                "renewable_generation": predicted_renewable
-            }
+            logger.error(f"Error calculating optimal prices: {e}")
+            prices["optimized_price"] = self.base_price
+            prices["adjustment_factor"] = 1.0
+            prices["predicted_supply"] = 0
+            prices[["supply_adjustment", "time_adjustment", "renewable_adjustment", "stability_adjustment"]] = 1.0
+        
+        return prices
     
-    def _store_pricing_results(self, db: Session, optimized_prices: List[Dict]):
-        """Store pricing optimization results"""
+    def _store_pricing_results(self, db: Session, optimized_prices: np.ndarray,
+                               optimization_timestamp: datetime) -> bool:
+        """Store pricing optimization results, returning whether they were written"""
         try:
-            optimization_timestamp = datetime.utcnow()
-            
-            for price_data in optimized_prices:
-                pricing_record = DynamicPricing(
-                    optimization_timestamp=optimization_timestamp,
-                    target_timestamp=price_data["target_timestamp"],
-                    optimized_price_kwh=price_data["optimized_price"],
-                    price_adjustment_factor=price_data["adjustment_factor"],
-                    predicted_demand_kw=price_data["predicted_demand"],
-                    predicted_supply_kw=price_data["predicted_supply"],
-                    renewable_generation_kw=price_data["renewable_generation"],
-                    optimization_algorithm="supply_demand_optimization",
-                    optimization_confidence=0.85
+            # Rows are built in one pass over the columns, as Python scalars
+            rows = [
+                {
+                    "optimization_timestamp": optimization_timestamp,
+                    "target_timestamp": target_timestamp,
+                    "optimized_price_kwh": price,
+                    "price_adjustment_factor": adjustment_factor,
+                    "predicted_demand_kw": demand,
+                    "predicted_supply_kw": supply,
+                    "renewable_generation_kw": renewable,
+                    "optimization_algorithm": "supply_demand_optimization",
+                    "optimization_confidence": 0.85
+                }
+                for target_timestamp, price, adjustment_factor, demand, supply, renewable in zip(
+                    optimized_prices["target_timestamp"].tolist(),
+                    optimized_prices["optimized_price"].tolist(),
+                    optimized_prices["adjustment_factor"].tolist(),
+                    optimized_prices["predicted_demand"].tolist(),
+                    optimized_prices["predicted_supply"].tolist(),
+                    optimized_prices["renewable_generation"].tolist()
                 )
-                
-                db.add(pricing_record)
+            ]
             
+            # One executemany instead of an ORM object per hour
+            db.execute(insert(DynamicPricing), rows)
             db.commit()
-            logger.info(f"Stored {len(optimized_prices)} pricing optimization results")
+            logger.info(f"Stored {len(rows)} pricing optimization results")
+            return True
             
         except Exception as e:
             logger.error(f"Error storing pricing results: {e}")
             db.rollback()
+            return False
     
     def get_current_price(self, meter_type: str = "residential") -> Dict:
         """Get current energy price for a meter type"""
         try:
-            db = SessionLocal()
-            
-            # Get latest pricing optimization
-            latest_pricing = db.query(DynamicPricing).filter(
-                DynamicPricing.target_timestamp >= datetime.utcnow() - timedelta(hours=1),
-                DynamicPricing.target_timestamp <= datetime.utcnow() + timedelta(hours=1)
-            ).order_by(DynamicPricing.target_timestamp.asc()).first()
-            
-            if latest_pricing:
-                current_price = latest_pricing.optimized_price_kwh
-            else:
-                # Fallback to base pricing
-                current_hour = datetime.utcnow().hour
-                if 17 <= current_hour <= 21:  # Peak hours
-                    current_price = self.base_price * self.peak_multiplier
-                elif 22 <= current_hour <= 6:  # Off-peak hours
-                    current_price = self.base_price * self.off_peak_multiplier
-                else:
-                    current_price = self.base_price
+            current_price = self._get_cached_optimized_price()
             
             # Apply meter type multiplier
             type_multipliers = {
@@ -320,8 +402,6 @@ class PricingService:
             
             final_price = current_price * type_multipliers.get(meter_type, 1.0)
             
-            db.close()
-            
             return {
                 "price_per_kwh": round(final_price, 4),
                 "meter_type": meter_type,
@@ -338,41 +418,61 @@ class PricingService:
                 "pricing_tier": "standard"
             }
     
+    def _get_cached_optimized_price(self) -> float:
+        """Current price before meter type adjustment, reused for a short TTL"""
+        cached_at, price = self._price_cache
+        if price is not None and time.monotonic() - cached_at < settings.PRICE_CACHE_TTL_SECONDS:
+            return price
+        
+        with self._price_lock:
+            cached_at, price = self._price_cache
+            if price is not None and time.monotonic() - cached_at < settings.PRICE_CACHE_TTL_SECONDS:
+                return price
+            
+            price = self._query_optimized_price()
+            self._price_cache = (time.monotonic(), price)
+            return price
+    
+    def _query_optimized_price(self) -> float:
+        """Get the optimized price for the current hour from the database"""
+        now = datetime.utcnow()
+        
+        with SessionLocal() as db:
+            # Get latest pricing optimization
+            optimized_price = db.scalar(_CURRENT_PRICE_STMT, {
+                "start": now - timedelta(hours=1),
+                "end": now + timedelta(hours=1)
+            })
+        
+        if optimized_price is not None:
+            return optimized_price
+        
+        # Fallback to base pricing
+        return self.base_price * float(self.hour_multipliers[now.hour])
+    
     def _get_current_pricing_tier(self) -> str:
         """Get current pricing tier based on time"""
-        current_hour = datetime.utcnow().hour
-        if 17 <= current_hour <= 21:
-            return "peak"
-        elif 22 <= current_hour <= 6:
-            return "off_peak"
-        else:
-            return "standard"
+        return _TIER_NAMES[_HOUR_TIER[datetime.utcnow().hour]]
     
     def get_price_forecast(self, hours_ahead: int = 24) -> List[Dict]:
         """Get price forecast for next N hours"""
         try:
-            db = SessionLocal()
-            
             start_time = datetime.utcnow()
             end_time = start_time + timedelta(hours=hours_ahead)
             
-            forecasts = db.query(DynamicPricing).filter(
-                DynamicPricing.target_timestamp >= start_time,
-                DynamicPricing.target_timestamp <= end_time
-            ).order_by(DynamicPricing.target_timestamp.asc()).all()
+            with SessionLocal() as db:
+                forecasts = db.execute(_PRICE_FORECAST_STMT, {"start": start_time, "end": end_time}).all()
             
-            price_forecast = []
-            for forecast in forecasts:
-                price_forecast.append({
+            return [
+                {
                     "timestamp": forecast.target_timestamp,
                     "price_per_kwh": forecast.optimized_price_kwh,
                     "adjustment_factor": forecast.price_adjustment_factor,
                     "predicted_demand": forecast.predicted_demand_kw,
                     "renewable_generation": forecast.renewable_generation_kw
-                })
-            
-            db.close()
-            return price_forecast
+                }
+                for forecast in forecasts
+            ]
             
         except Exception as e:
             logger.error(f"Error getting price forecast: {e}")
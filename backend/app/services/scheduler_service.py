@@ -3,13 +3,12 @@ Scheduler Service for Periodic Tasks
 Handles ML model training, weather updates, and pricing optimization
 """
 
-import asyncio
 import logging
-import threading
-import time
-from datetime import datetime, timedelta
 from typing import Optional
-import schedule
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from app.core.config import settings
 from app.services.weather_service import WeatherService
@@ -17,13 +16,17 @@ from app.services.pricing_service import PricingService
 
 logger = logging.getLogger(__name__)
 
+# Worker threads for scheduled jobs, kept apart from the event loop's default
+# executor so long jobs cannot starve the MQTT ingest flushes that use it
+SCHEDULER_MAX_WORKERS = 4
+
 
 class SchedulerService:
     """Service for managing scheduled tasks"""
 
     def __init__(self):
         self.is_running = False
-        self.scheduler_thread: Optional[threading.Thread] = None
+        self.scheduler: Optional[AsyncIOScheduler] = None
         self.weather_service = WeatherService()
         self.pricing_service = PricingService()
 
@@ -35,12 +38,16 @@ class SchedulerService:
 
         self.is_running = True
 
+        # Runs on the application's event loop and sleeps until the next job
+        # is due; blocking jobs run on the scheduler's own thread pool
+        self.scheduler = AsyncIOScheduler(
+            executors={"default": ThreadPoolExecutor(SCHEDULER_MAX_WORKERS)}
+        )
+
         # Schedule periodic tasks
         self._schedule_tasks()
 
-        # Start scheduler in a separate thread
-        self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self.scheduler_thread.start()
+        self.scheduler.start()
 
         logger.info("Scheduler service started")
 
@@ -48,71 +55,42 @@ class SchedulerService:
         """Stop the scheduler service"""
         self.is_running = False
 
-        if self.scheduler_thread:
-            self.scheduler_thread.join(timeout=5)
+        if self.scheduler:
+            self.scheduler.shutdown(wait=False)
+            self.scheduler = None
+
+        self.weather_service.close()
 
-        schedule.clear()
         logger.info("Scheduler service stopped")
 
     def _schedule_tasks(self):
         """Schedule all periodic tasks"""
 
-        # Weather data updates every 30 minutes
-        schedule.every(settings.WEATHER_UPDATE_INTERVAL_MINUTES).minutes.do(
-            self._safe_run, self.weather_service.update_weather_data
-        )
-
-        # Energy consumption predictions every hour
-        schedule.every().hour.do(
-            self._safe_run, self._run_energy_predictions
-        )
-
-        # Renewable energy forecasts every 2 hours
-        schedule.every(2).hours.do(
-            self._safe_run, self._run_renewable_forecasts
-        )
-
-        # Dynamic pricing optimization every 15 minutes
-        schedule.every(15).minutes.do(
-            self._safe_run, self.pricing_service.optimize_pricing
-        )
-
-        # Model retraining daily at 2 AM
-        schedule.every().day.at("02:00").do(
-            self._safe_run, self._retrain_models
-        )
-
-        # Data cleanup weekly on Sunday at 3 AM
-        schedule.every().sunday.at("03:00").do(
-            self._safe_run, self._cleanup_old_data
-        )
-
-        # Grid health check every 5 minutes
-        schedule.every(5).minutes.do(
-            self._safe_run, self._check_grid_health
-        )
-
-        # Billing generation daily at 1 AM (will check if it's the 1st of month)
-        schedule.every().day.at("01:00").do(
-            self._safe_run, self._generate_monthly_bills
-        )
+        jobs = [
+            # Weather data updates every 30 minutes
+            (self.weather_service.update_weather_data,
+             IntervalTrigger(minutes=settings.WEATHER_UPDATE_INTERVAL_MINUTES)),
+            # Energy consumption predictions every hour
+            (self._run_energy_predictions, IntervalTrigger(hours=1)),
+            # Renewable energy forecasts every 2 hours
+            (self._run_renewable_forecasts, IntervalTrigger(hours=2)),
+            # Dynamic pricing optimization every 15 minutes
+            (self.pricing_service.optimize_pricing, IntervalTrigger(minutes=15)),
+            # Model retraining daily at 2 AM
+            (self._retrain_models, CronTrigger(hour=2, minute=0)),
+            # Data cleanup weekly on Sunday at 3 AM
+            (self._cleanup_old_data, CronTrigger(day_of_week="sun", hour=3, minute=0)),
+            # Grid health check every 5 minutes
+            (self._check_grid_health, IntervalTrigger(minutes=5)),
+            # Billing generation daily at 1 AM (will check if it's the 1st of month)
+            (self._generate_monthly_bills, CronTrigger(hour=1, minute=0)),
+        ]
+
+        for func, trigger in jobs:
+            self.scheduler.add_job(self._safe_run, trigger, args=[func], name=func.__name__)
 
         logger.info("Scheduled tasks configured")
 
-    def _run_scheduler(self):
-        """Run the scheduler loop"""
-        logger.info("Scheduler loop started")
-
-        while self.is_running:
-            try:
-                schedule.run_pending()
-                time.sleep(1)
-            except Exception as e:
-                logger.error(f"Error in scheduler loop: {e}")
-                time.sleep(5)  # Wait before retrying
-
-        logger.info("Scheduler loop stopped")
-
     def _safe_run(self, func, *args, **kwargs):
         """Safely run a scheduled function with error handling"""
         try:
@@ -229,12 +207,14 @@ class SchedulerService:
 
     def get_next_run_times(self):
         """Get next run times for all scheduled jobs"""
+        if not self.scheduler:
+            return []
+
         jobs_info = []
-        for job in schedule.jobs:
+        for job in self.scheduler.get_jobs():
             jobs_info.append({
-                "job": str(job.job_func),
-                "next_run": job.next_run.isoformat() if job.next_run else None,
-                "interval": str(job.interval),
-                "unit": job.unit
+                "job": job.name,
+                "next_run": job.next_run_time.isoformat() if job.next_run_time else None,
+                "trigger": str(job.trigger)
             })
         return jobs_info
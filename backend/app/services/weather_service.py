@@ -3,10 +3,19 @@ Weather Service for Renewable Energy Forecasting
 Integrates with OpenWeatherMap API for weather data
 """
 
+import functools
 import logging
+import numpy as np
+import orjson
+import redis
 import requests
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -14,6 +23,102 @@ from app.core.database import SessionLocal
 
 logger = logging.getLogger(__name__)
 
+# Concurrent API calls per weather sweep
+MAX_CONCURRENT_FETCHES = 20
+
+# Transient API failures (rate limiting, server errors) are retried with backoff
+_API_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"])
+)
+
+# How long a forecast's ETag and trimmed body are kept for conditional requests
+_FORECAST_ETAG_TTL_SECONDS = 24 * 3600
+
+# Clear-sky solar irradiance at noon (W/m²)
+_BASE_IRRADIANCE = 1000
+
+# Time of day factor by local solar hour (simplified solar angle): 1 at
+# noon, 0.2 at 6am/6pm, no solar irradiance at night
+_SOLAR_TIME_FACTOR = tuple(
+    1 - (abs(12 - hour) / 6) * 0.8 if 6 <= hour <= 18 else 0
+    for hour in range(24)
+)
+
+# Irradiance factor by weather condition
+_CONDITION_FACTORS = {
+    "Clear": 1.0,
+    "Clouds": 0.8,
+    "Rain": 0.3,
+    "Snow": 0.2,
+    "Thunderstorm": 0.2,
+    "Drizzle": 0.5,
+    "Mist": 0.7,
+    "Fog": 0.4
+}
+
+# Decimal places coordinates are rounded to (~1 km) to identify a site, for
+# the response cache, forecast ETags and per-sweep deduplication alike
+_SITE_DECIMALS = 2
+
+# Fields stored as ISO strings in the cache and restored to datetimes
+_CACHED_DATETIME_FIELDS = ("timestamp", "sunrise", "sunset")
+
+
+def _restore_datetimes(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn cached ISO timestamp strings back into datetimes"""
+    for field in _CACHED_DATETIME_FIELDS:
+        if field in item:
+            item[field] = datetime.fromisoformat(item[field])
+    return item
+
+
+def _site(lat: float, lon: float) -> Tuple[float, float]:
+    """Site a location belongs to: its coordinates rounded to _SITE_DECIMALS"""
+    return round(lat, _SITE_DECIMALS), round(lon, _SITE_DECIMALS)
+
+
+def _solar_hour(utc_time: datetime, lon: float) -> int:
+    """Approximate local solar hour at a longitude (15 degrees per hour from UTC)"""
+    return (utc_time.hour + round(lon / 15)) % 24
+
+
+def _redis_cached(prefix: str, ttl_seconds: int):
+    """Cache a (lat, lon, ...) API lookup in Redis, keyed by site"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, lat: float, lon: float, *args, **kwargs):
+            key = ":".join(
+                ["owm", prefix, *map(str, _site(lat, lon))]
+                + [str(arg) for arg in args]
+                + [f"{name}={value}" for name, value in sorted(kwargs.items())]
+            )
+            
+            try:
+                cached = self.redis.get(key)
+                if cached is not None:
+                    data = orjson.loads(cached)
+                    if isinstance(data, list):
+                        return [_restore_datetimes(item) for item in data]
+                    return _restore_datetimes(data)
+            except redis.RedisError as e:
+                logger.warning(f"Weather cache unavailable: {e}")
+            
+            result = method(self, lat, lon, *args, **kwargs)
+            
+            # Failed or unconfigured lookups come back empty and are not cached
+            if result:
+                try:
+                    self.redis.setex(key, ttl_seconds, orjson.dumps(result))
+                except redis.RedisError as e:
+                    logger.warning(f"Weather cache unavailable: {e}")
+            
+            return result
+        return wrapper
+    return decorator
+
 
 class WeatherService:
     """Service for fetching and processing weather data"""
@@ -23,6 +128,51 @@ class WeatherService:
         self.base_url = "https://api.openweathermap.org/data/2.5"
         self.forecast_url = "https://api.openweathermap.org/data/2.5/forecast"
         
+        # Pooled sessions, one per thread (requests.Session is not thread-safe),
+        # so repeated calls reuse keep-alive connections
+        self._local = threading.local()
+        self._sessions = weakref.WeakSet()
+        self._sessions_lock = threading.Lock()
+        
+        # Fetch workers live until close(), so their sessions (and keep-alive
+        # connections) carry over from one sweep to the next
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
+        # Shared cache for API responses; connects lazily on first use
+        self.redis = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session for the calling thread"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=32, max_retries=_API_RETRY))
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.add(session)
+        return session
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Worker pool for concurrent API calls, created on first use"""
+        with self._sessions_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES,
+                                                    thread_name_prefix="weather")
+            return self._executor
+    
+    def close(self):
+        """Stop the fetch workers and release every thread's pooled connections (on shutdown)"""
+        with self._sessions_lock:
+            executor, self._executor = self._executor, None
+            sessions = list(self._sessions)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for session in sessions:
+            session.close()
+    
+    @_redis_cached("cur", settings.WEATHER_CACHE_TTL_SECONDS)
     def get_current_weather(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
         """Get current weather data for a location"""
         try:
@@ -38,10 +188,10 @@ class WeatherService:
                 "units": "metric"
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
             return {
                 "timestamp": datetime.utcnow(),
@@ -62,6 +212,7 @@ class WeatherService:
             logger.error(f"Error fetching current weather: {e}")
             return None
     
+    @_redis_cached("fc", settings.WEATHER_FORECAST_CACHE_TTL_SECONDS)
     def get_weather_forecast(self, lat: float, lon: float, days: int = 5) -> List[Dict[str, Any]]:
         """Get weather forecast for a location"""
         try:
@@ -78,26 +229,26 @@ class WeatherService:
                 "cnt": min(days * 8, 40)  # 8 forecasts per day (3-hour intervals), max 40
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            # Revalidate the last forecast for this site instead of downloading
+            # it again when the API reports it unchanged
+            site_lat, site_lon = _site(lat, lon)
+            etag_key = f"owm:fc:etag:{site_lat}:{site_lon}:{params['cnt']}"
+            validator = self._get_forecast_validator(etag_key)
+            headers = {"If-None-Match": validator["etag"]} if validator else None
+            
+            response = self.session.get(url, params=params, headers=headers, timeout=10)
+            if response.status_code == 304 and validator:
+                return [_restore_datetimes(item) for item in orjson.loads(validator["body"])]
             response.raise_for_status()
             
-            data = response.json()
-            forecasts = []
-            
-            for item in data["list"]:
-                forecast = {
-                    "timestamp": datetime.fromtimestamp(item["dt"]),
-                    "temperature_c": item["main"]["temp"],
-                    "humidity_percent": item["main"]["humidity"],
-                    "pressure_hpa": item["main"]["pressure"],
-                    "wind_speed_ms": item["wind"].get("speed", 0),
-                    "wind_direction_deg": item["wind"].get("deg", 0),
-                    "cloud_cover_percent": item["clouds"]["all"],
-                    "weather_condition": item["weather"][0]["main"],
-                    "weather_description": item["weather"][0]["description"],
-                    "precipitation_mm": item.get("rain", {}).get("3h", 0) + item.get("snow", {}).get("3h", 0)
-                }
-                forecasts.append(forecast)
+            # Keep only the forecast entries; the rest of the payload (city
+            # metadata etc.) and the raw body are released on return
+            items = orjson.loads(response.content)["list"]
+            forecasts = [self._parse_forecast_item(item) for item in items]
+            
+            etag = response.headers.get("ETag")
+            if etag:
+                self._set_forecast_validator(etag_key, etag, forecasts)
             
             return forecasts
             
@@ -105,43 +256,65 @@ class WeatherService:
             logger.error(f"Error fetching weather forecast: {e}")
             return []
     
-    def calculate_solar_irradiance(self, weather_data: Dict[str, Any]) -> float:
-        """Calculate estimated solar irradiance from weather data"""
+    def _get_forecast_validator(self, key: str) -> Optional[Dict[str, bytes]]:
+        """Stored ETag and trimmed body of the last forecast for a site, if any"""
         try:
-            # Base solar irradiance (clear sky at noon)
-            base_irradiance = 1000  # W/m²
-            
-            # Cloud cover reduction factor
-            cloud_cover = weather_data.get("cloud_cover_percent", 0) / 100
-            cloud_factor = 1 - (cloud_cover * 0.75)  # Clouds reduce irradiance by up to 75%
-            
-            # Time of day factor (simplified)
-            current_hour = weather_data["timestamp"].hour
-            if 6 <= current_hour <= 18:
-                # Simplified solar angle calculation
-                solar_angle_factor = abs(12 - current_hour) / 6  # 0 at noon, 1 at 6am/6pm
-                time_factor = 1 - (solar_angle_factor * 0.8)
-            else:
-                time_factor = 0  # No solar irradiance at night
-            
-            # Weather condition factor
-            condition = weather_data.get("weather_condition", "Clear")
-            condition_factors = {
-                "Clear": 1.0,
-                "Clouds": 0.8,
-                "Rain": 0.3,
-                "Snow": 0.2,
-                "Thunderstorm": 0.2,
-                "Drizzle": 0.5,
-                "Mist": 0.7,
-                "Fog": 0.4
-            }
-            condition_factor = condition_factors.get(condition, 0.8)
+            validator = self.redis.hgetall(key)
+        except redis.RedisError as e:
+            logger.warning(f"Weather cache unavailable: {e}")
+            return None
+        
+        if validator.get(b"etag") and validator.get(b"body"):
+            return {"etag": validator[b"etag"].decode(), "body": validator[b"body"]}
+        return None
+    
+    def _set_forecast_validator(self, key: str, etag: str, forecasts: List[Dict[str, Any]]):
+        """Store a forecast's ETag with its trimmed body"""
+        try:
+            pipeline = self.redis.pipeline()
+            pipeline.hset(key, mapping={"etag": etag, "body": orjson.dumps(forecasts)})
+            pipeline.expire(key, _FORECAST_ETAG_TTL_SECONDS)
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Weather cache unavailable: {e}")
+    
+    @staticmethod
+    def _parse_forecast_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Trim one forecast entry of the API payload to the fields we keep"""
+        main = item["main"]
+        wind = item["wind"]
+        weather = item["weather"][0]
+        
+        precipitation = 0
+        if rain := item.get("rain"):
+            precipitation += rain.get("3h", 0)
+        if snow := item.get("snow"):
+            precipitation += snow.get("3h", 0)
+        
+        return {
+            "timestamp": datetime.utcfromtimestamp(item["dt"]),
+            "temperature_c": main["temp"],
+            "humidity_percent": main["humidity"],
+            "pressure_hpa": main["pressure"],
+            "wind_speed_ms": wind.get("speed", 0),
+            "wind_direction_deg": wind.get("deg", 0),
+            "cloud_cover_percent": item["clouds"]["all"],
+            "weather_condition": weather["main"],
+            "weather_description": weather["description"],
+            "precipitation_mm": precipitation
+        }
+    
+    def calculate_solar_irradiance(self, weather_data: Dict[str, Any], lon: float = 0.0) -> float:
+        """Calculate estimated solar irradiance from weather data at a longitude"""
+        try:
+            # Cloud cover reduction factor: clouds reduce irradiance by up to 75%
+            cloud_factor = 1 - (weather_data.get("cloud_cover_percent", 0) / 100 * 0.75)
             
-            # Calculate final irradiance
-            irradiance = base_irradiance * cloud_factor * time_factor * condition_factor
+            time_factor = _SOLAR_TIME_FACTOR[_solar_hour(weather_data["timestamp"], lon)]
+            condition_factor = _CONDITION_FACTORS.get(weather_data.get("weather_condition", "Clear"), 0.8)
             
-            return max(0, irradiance)
+            # Calculate final irradiance
+            return max(0, _BASE_IRRADIANCE * cloud_factor * time_factor * condition_factor)
             
         except Exception as e:
             logger.error(f"Error calculating solar irradiance: {e}")
@@ -149,36 +322,68 @@ class WeatherService:
     
     def update_weather_data(self):
         """Update weather data for all renewable energy sources"""
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            
             # Get all solar panel and wind turbine locations
             from app.models.renewable_energy import SolarPanel, WindTurbine
             
             solar_panels = db.query(SolarPanel).filter(SolarPanel.is_active == True).all()
             wind_turbines = db.query(WindTurbine).filter(WindTurbine.is_active == True).all()
             
+            # Irradiance is zero at night whatever the weather, so solar panels
+            # are only fetched where it is daytime in local solar time
+            now = datetime.utcnow()
+            daylight_panels = [
+                panel for panel in solar_panels
+                if _SOLAR_TIME_FACTOR[_solar_hour(now, panel.longitude)] > 0
+            ]
+            if len(daylight_panels) < len(solar_panels):
+                logger.debug(f"Night time, skipping weather for {len(solar_panels) - len(daylight_panels)} solar panels")
+            solar_panels = daylight_panels
+            
+            # Fetch all locations concurrently; the calls are network-bound
+            locations = [(device.latitude, device.longitude) for device in solar_panels + wind_turbines]
+            results = self._fetch_current_weather_many(locations)
+            solar_weather = results[:len(solar_panels)]
+            wind_weather = results[len(solar_panels):]
+            
             # Update weather for solar panels
-            for panel in solar_panels:
-                weather_data = self.get_current_weather(panel.latitude, panel.longitude)
+            for panel, weather_data in zip(solar_panels, solar_weather):
                 if weather_data:
                     # Add solar irradiance calculation
-                    weather_data["irradiance_wm2"] = self.calculate_solar_irradiance(weather_data)
+                    weather_data["irradiance_wm2"] = self.calculate_solar_irradiance(weather_data, panel.longitude)
                     
                     # Store weather data (you might want to create a weather_data table)
                     logger.debug(f"Updated weather for solar panel {panel.panel_id}: {weather_data}")
             
             # Update weather for wind turbines
-            for turbine in wind_turbines:
-                weather_data = self.get_current_weather(turbine.latitude, turbine.longitude)
+            for turbine, weather_data in zip(wind_turbines, wind_weather):
                 if weather_data:
                     logger.debug(f"Updated weather for wind turbine {turbine.turbine_id}: {weather_data}")
             
-            db.close()
             logger.info("Weather data update completed")
             
         except Exception as e:
             logger.error(f"Error updating weather data: {e}")
+        finally:
+            db.close()
+    
+    def _fetch_current_weather_many(self, locations: List[Tuple[float, float]]) -> List[Optional[Dict[str, Any]]]:
+        """Get current weather for several locations at once, in input order"""
+        if not locations:
+            return []
+        
+        # Devices at the same site share one API call
+        sites = list(dict.fromkeys(_site(lat, lon) for lat, lon in locations))
+        
+        weather_by_site = dict(zip(sites, self.executor.map(lambda site: self.get_current_weather(*site), sites)))
+        
+        # Each device gets its own copy, since callers add fields per device
+        results = []
+        for lat, lon in locations:
+            weather_data = weather_by_site[_site(lat, lon)]
+            results.append(dict(weather_data) if weather_data else None)
+        return results
     
     def get_weather_for_location(self, lat: float, lon: float) -> Dict[str, Any]:
         """Get comprehensive weather data for a specific location"""
@@ -186,7 +391,7 @@ class WeatherService:
         forecast = self.get_weather_forecast(lat, lon)
         
         if current_weather:
-            current_weather["irradiance_wm2"] = self.calculate_solar_irradiance(current_weather)
+            current_weather["irradiance_wm2"] = self.calculate_solar_irradiance(current_weather, lon)
         
         return {
             "current": current_weather,
@@ -222,3 +427,20 @@ class WeatherService:
         except Exception as e:
             logger.error(f"Error calculating wind power potential: {e}")
             return 0.0
+    
+    def calculate_wind_power_potential_array(self, wind_speeds_ms: np.ndarray,
+                                             turbine_specs: Dict[str, float]) -> np.ndarray:
+        """Calculate wind power potential for an array of wind speeds"""
+        cut_in_speed = turbine_specs.get("cut_in_speed_ms", 3.0)
+        cut_out_speed = turbine_specs.get("cut_out_speed_ms", 25.0)
+        rated_speed = turbine_specs.get("rated_speed_ms", 12.0)
+        rated_power_kw = turbine_specs.get("capacity_kw", 1000.0)
+        
+        wind_speeds_ms = np.asarray(wind_speeds_ms, dtype=float)
+        
+        # Linear between cut-in and rated speed, flat at rated power above it
+        power_ratio = np.clip((wind_speeds_ms - cut_in_speed) / (rated_speed - cut_in_speed), 0.0, 1.0)
+        
+        # No output below cut-in or above cut-out speed
+        operating = (wind_speeds_ms >= cut_in_speed) & (wind_speeds_ms <= cut_out_speed)
+        return np.where(operating, rated_power_kw * power_ratio, 0.0)
@@ -3,35 +3,114 @@ Data validation utilities for Smart Grid IoT Analytics
 """
 
 import re
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any, Union
 import logging
+import numpy as np
+import pandas as pd
+from ciso8601 import parse_datetime
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class ValidationResult:
+    """Outcome of validating a single record"""
+    valid: bool
+    errors: List[str]
+    warnings: List[str]
+
+
+def _as_naive_utc(timestamp: datetime) -> datetime:
+    """Convert a timestamp to naive UTC, comparable with utcnow()"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _parse_utc_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp to naive UTC"""
+    return _as_naive_utc(parse_datetime(value))
+
+
 class DataValidator:
     """Utility class for validating smart grid data"""
     
+    # Meter ID should be alphanumeric, 3-20 characters
+    _METER_RE = re.compile(r'^[A-Z0-9]{3,20}$')
+    
+    # Energy reading fields, checked on every record of a batch
+    _REQUIRED_FIELDS = ('meter_id', 'timestamp', 'active_energy')
+    _ENERGY_FIELDS = ('active_energy', 'reactive_energy', 'apparent_energy')
+    _POWER_FIELDS = ('active_power', 'reactive_power')
+    _VOLTAGE_FIELDS = ('voltage_l1', 'voltage_l2', 'voltage_l3')
+    _CURRENT_FIELDS = ('current_l1', 'current_l2', 'current_l3')
+    _QUALITY_FLAGS = frozenset(('good', 'estimated', 'missing', 'error'))
+    
+    # Numeric reading checks, in reporting order:
+    # field -> (error low, error high, warning low, warning high, error, warning).
+    # Non-numbers and values outside the error bounds are errors; values outside
+    # the warning bounds are warnings. None means unbounded.
+    _READING_CHECKS = {
+        **{field: (0, None, None, 10000,
+                   "Invalid {field}: must be non-negative number",
+                   "Unusually high {field}: {value}") for field in _ENERGY_FIELDS},
+        **{field: (0, None, None, 5000,
+                   "Invalid {field}: must be non-negative number",
+                   "Unusually high {field}: {value}") for field in _POWER_FIELDS},
+        **{field: (None, None, 100, 300,
+                   "Invalid {field}: must be a number",
+                   "Voltage out of normal range: {field}={value}V") for field in _VOLTAGE_FIELDS},
+        **{field: (0, None, None, 1000,
+                   "Invalid {field}: must be non-negative number",
+                   "Unusually high current: {field}={value}A") for field in _CURRENT_FIELDS},
+        'power_factor': (0, 1, 0.7, None,
+                         "Power factor must be between 0 and 1",
+                         "Low power factor: {value}"),
+        'frequency': (None, None, 45, 65,
+                      "Frequency must be a number",
+                      "Frequency out of normal range: {value}Hz")
+    }
+    
+    # Value ranges that produce neither an error nor a warning
+    _CLEAN_READING_RANGES = {
+        field: (warn_low if warn_low is not None else low, warn_high if warn_high is not None else high)
+        for field, (low, high, warn_low, warn_high, _, _) in _READING_CHECKS.items()
+    }
+    
+    # Energy reading batches at least this large are pre-screened with pandas
+    _VECTORIZE_MIN_RECORDS = 64
+    
+    # Fields normalized by sanitize_data / sanitize_batch
+    _NUMERIC_FIELDS = (
+        'active_energy', 'reactive_energy', 'apparent_energy',
+        'active_power', 'reactive_power',
+        'voltage_l1', 'voltage_l2', 'voltage_l3',
+        'current_l1', 'current_l2', 'current_l3',
+        'power_factor', 'frequency',
+        'power_output_kw', 'energy_generated_kwh',
+        'irradiance_wm2', 'wind_speed_ms', 'wind_direction_deg',
+        'temperature_c', 'capacity_factor', 'efficiency'
+    )
+    _STRING_FIELDS = ('meter_id', 'source_id', 'quality_flag')
+    
     @staticmethod
     def validate_meter_id(meter_id: str) -> bool:
         """Validate smart meter ID format"""
         if not meter_id or not isinstance(meter_id, str):
             return False
         
-        # Meter ID should be alphanumeric, 3-20 characters
-        pattern = r'^[A-Z0-9]{3,20}$'
-        return bool(re.match(pattern, meter_id))
+        return bool(DataValidator._METER_RE.match(meter_id))
     
     @staticmethod
-    def validate_energy_reading(reading: Dict[str, Any]) -> Dict[str, Any]:
+    def validate_energy_reading(reading: Dict[str, Any]) -> ValidationResult:
         """Validate energy reading data"""
         errors = []
         warnings = []
         
         # Required fields
-        required_fields = ['meter_id', 'timestamp', 'active_energy']
-        for field in required_fields:
+        for field in DataValidator._REQUIRED_FIELDS:
             if field not in reading or reading[field] is None:
                 errors.append(f"Missing required field: {field}")
         
@@ -43,7 +122,7 @@ class DataValidator:
         # Validate timestamp
         if 'timestamp' in reading:
             try:
-                timestamp = datetime.fromisoformat(reading['timestamp'].replace('Z', '+00:00'))
+                timestamp = _parse_utc_timestamp(reading['timestamp'])
                 
                 # Check if timestamp is reasonable (not too far in past/future)
                 now = datetime.utcnow()
@@ -52,79 +131,30 @@ class DataValidator:
                 elif timestamp < now - timedelta(days=30):
                     warnings.append("Timestamp is more than 30 days old")
                     
-            except (ValueError, AttributeError):
+            except (ValueError, TypeError):
                 errors.append("Invalid timestamp format")
         
-        # Validate energy values
-        energy_fields = ['active_energy', 'reactive_energy', 'apparent_energy']
-        for field in energy_fields:
-            if field in reading and reading[field] is not None:
-                value = reading[field]
-                if not isinstance(value, (int, float)) or value < 0:
-                    errors.append(f"Invalid {field}: must be non-negative number")
-                elif value > 10000:  # Reasonable upper limit
-                    warnings.append(f"Unusually high {field}: {value}")
-        
-        # Validate power values
-        power_fields = ['active_power', 'reactive_power']
-        for field in power_fields:
-            if field in reading and reading[field] is not None:
-                value = reading[field]
-                if not isinstance(value, (int, float)) or value < 0:
-                    errors.append(f"Invalid {field}: must be non-negative number")
-                elif value > 5000:  # Reasonable upper limit for power
-                    warnings.append(f"Unusually high {field}: {value}")
-        
-        # Validate electrical parameters
-        voltage_fields = ['voltage_l1', 'voltage_l2', 'voltage_l3']
-        for field in voltage_fields:
-            if field in reading and reading[field] is not None:
-                value = reading[field]
-                if not isinstance(value, (int, float)):
-                    errors.append(f"Invalid {field}: must be a number")
-                elif value < 100 or value > 300:  # Reasonable voltage range
-                    warnings.append(f"Voltage out of normal range: {field}={value}V")
-        
-        # Validate current
-        current_fields = ['current_l1', 'current_l2', 'current_l3']
-        for field in current_fields:
-            if field in reading and reading[field] is not None:
-                value = reading[field]
-                if not isinstance(value, (int, float)) or value < 0:
-                    errors.append(f"Invalid {field}: must be non-negative number")
-                elif value > 1000:  # Reasonable upper limit for current
-                    warnings.append(f"Unusually high current: {field}={value}A")
-        
-        # Validate power factor
-        if 'power_factor' in reading and reading['power_factor'] is not None:
-            pf = reading['power_factor']
-            if not isinstance(pf, (int, float)) or pf < 0 or pf > 1:
-                errors.append("Power factor must be between 0 and 1")
-            elif pf < 0.7:
-                warnings.append(f"Low power factor: {pf}")
-        
-        # Validate frequency
-        if 'frequency' in reading and reading['frequency'] is not None:
-            freq = reading['frequency']
-            if not isinstance(freq, (int, float)):
-                errors.append("Frequency must be a number")
-            elif freq < 45 or freq > 65:  # Reasonable frequency range
-                warnings.append(f"Frequency out of normal range: {freq}Hz")
+        # Validate energy, power and electrical parameters
+        for field, (low, high, warn_low, warn_high, error, warning) in DataValidator._READING_CHECKS.items():
+            value = reading.get(field)
+            if value is None:
+                continue
+            if not isinstance(value, (int, float)) or \
+                    (low is not None and value < low) or (high is not None and value > high):
+                errors.append(error.format(field=field, value=value))
+            elif (warn_low is not None and value < warn_low) or (warn_high is not None and value > warn_high):
+                warnings.append(warning.format(field=field, value=value))
         
         # Validate quality flag
         if 'quality_flag' in reading:
-            valid_flags = ['good', 'estimated', 'missing', 'error']
-            if reading['quality_flag'] not in valid_flags:
+            quality_flag = reading['quality_flag']
+            if not isinstance(quality_flag, str) or quality_flag not in DataValidator._QUALITY_FLAGS:
                 errors.append(f"Invalid quality flag: {reading['quality_flag']}")
         
-        return {
-            'valid': len(errors) == 0,
-            'errors': errors,
-            'warnings': warnings
-        }
+        return ValidationResult(valid=len(errors) == 0, errors=errors, warnings=warnings)
     
     @staticmethod
-    def validate_renewable_data(data: Dict[str, Any], source_type: str) -> Dict[str, Any]:
+    def validate_renewable_data(data: Dict[str, Any], source_type: str) -> ValidationResult:
         """Validate renewable energy generation data"""
         errors = []
         warnings = []
@@ -140,14 +170,15 @@ class DataValidator:
             if not isinstance(data['source_id'], str) or len(data['source_id']) < 3:
                 errors.append("Invalid source ID")
         
-        # Validate timestamp
+        # Validate timestamp; parsed once and reused by the solar nighttime check
+        timestamp = None
         if 'timestamp' in data:
             try:
-                timestamp = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
+                timestamp = parse_datetime(data['timestamp'])
                 now = datetime.utcnow()
-                if timestamp > now + timedelta(hours=1):
+                if _as_naive_utc(timestamp) > now + timedelta(hours=1):
                     warnings.append("Timestamp is in the future")
-            except (ValueError, AttributeError):
+            except (ValueError, TypeError):
                 errors.append("Invalid timestamp format")
         
         # Validate power output
@@ -169,13 +200,12 @@ class DataValidator:
                     warnings.append(f"Unusually high irradiance: {irradiance}W/m²")
             
             # Check for nighttime generation
-            if 'timestamp' in data and 'power_output_kw' in data:
+            if timestamp is not None and 'power_output_kw' in data:
                 try:
-                    timestamp = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
                     hour = timestamp.hour
                     if (hour < 6 or hour > 20) and data['power_output_kw'] > 0:
                         warnings.append("Solar generation during nighttime hours")
-                except:
+                except TypeError:
                     pass
         
         elif source_type == 'wind':
@@ -200,14 +230,10 @@ class DataValidator:
             elif cf > 0.9:
                 warnings.append(f"Unusually high capacity factor: {cf}")
         
-        return {
-            'valid': len(errors) == 0,
-            'errors': errors,
-            'warnings': warnings
-        }
+        return ValidationResult(valid=len(errors) == 0, errors=errors, warnings=warnings)
     
     @staticmethod
-    def validate_pricing_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    def validate_pricing_data(data: Dict[str, Any]) -> ValidationResult:
         """Validate pricing data"""
         errors = []
         warnings = []
@@ -233,11 +259,7 @@ class DataValidator:
             if not isinstance(hour, int) or hour < 0 or hour > 23:
                 errors.append("Peak end hour must be between 0 and 23")
         
-        return {
-            'valid': len(errors) == 0,
-            'errors': errors,
-            'warnings': warnings
-        }
+        return ValidationResult(valid=len(errors) == 0, errors=errors, warnings=warnings)
     
     @staticmethod
     def sanitize_data(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -248,18 +270,7 @@ class DataValidator:
         sanitized = {k: v for k, v in sanitized.items() if v is not None}
         
         # Convert string numbers to float
-        numeric_fields = [
-            'active_energy', 'reactive_energy', 'apparent_energy',
-            'active_power', 'reactive_power',
-            'voltage_l1', 'voltage_l2', 'voltage_l3',
-            'current_l1', 'current_l2', 'current_l3',
-            'power_factor', 'frequency',
-            'power_output_kw', 'energy_generated_kwh',
-            'irradiance_wm2', 'wind_speed_ms', 'wind_direction_deg',
-            'temperature_c', 'capacity_factor', 'efficiency'
-        ]
-        
-        for field in numeric_fields:
+        for field in DataValidator._NUMERIC_FIELDS:
             if field in sanitized and isinstance(sanitized[field], str):
                 try:
                     sanitized[field] = float(sanitized[field])
@@ -268,13 +279,37 @@ class DataValidator:
                     del sanitized[field]
         
         # Normalize string fields
-        string_fields = ['meter_id', 'source_id', 'quality_flag']
-        for field in string_fields:
+        for field in DataValidator._STRING_FIELDS:
             if field in sanitized and isinstance(sanitized[field], str):
                 sanitized[field] = sanitized[field].strip().upper()
         
         return sanitized
     
+    @staticmethod
+    def sanitize_batch(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sanitize a batch of records column-wise; the batch form of sanitize_data"""
+        if not records:
+            return []
+        
+        df = pd.DataFrame.from_records(records)
+        
+        # Numeric fields become numbers; unparseable values become NaN and are dropped below
+        for field in DataValidator._NUMERIC_FIELDS:
+            if field in df.columns:
+                df[field] = pd.to_numeric(df[field], errors='coerce')
+        
+        # Normalize string fields, leaving non-string values as they are
+        for field in DataValidator._STRING_FIELDS:
+            if field in df.columns:
+                is_str = df[field].map(lambda value: isinstance(value, str))
+                df.loc[is_str, field] = df.loc[is_str, field].str.strip().str.upper()
+        
+        # Drop missing, None and invalid values per record (NaN != NaN)
+        return [
+            {key: value for key, value in record.items() if value is not None and value == value}
+            for record in df.to_dict('records')
+        ]
+    
     @staticmethod
     def validate_batch_data(data_list: List[Dict[str, Any]], data_type: str) -> Dict[str, Any]:
         """Validate a batch of data records"""
@@ -283,7 +318,16 @@ class DataValidator:
         errors = []
         warnings = []
         
+        # Records that pass every check in one vectorized pass skip the per-record validator
+        clean = None
+        if data_type == 'energy_reading' and total_records >= DataValidator._VECTORIZE_MIN_RECORDS:
+            clean = DataValidator._clean_energy_readings(data_list)
+        
         for i, record in enumerate(data_list):
+            if clean is not None and clean[i]:
+                valid_records += 1
+                continue
+            
             if data_type == 'energy_reading':
                 validation = DataValidator.validate_energy_reading(record)
             elif data_type == 'solar_data':
@@ -296,12 +340,12 @@ class DataValidator:
                 errors.append(f"Unknown data type: {data_type}")
                 continue
             
-            if validation['valid']:
+            if validation.valid:
                 valid_records += 1
             else:
-                errors.extend([f"Record {i+1}: {error}" for error in validation['errors']])
+                errors.extend([f"Record {i+1}: {error}" for error in validation.errors])
             
-            warnings.extend([f"Record {i+1}: {warning}" for warning in validation['warnings']])
+            warnings.extend([f"Record {i+1}: {warning}" for warning in validation.warnings])
         
         return {
             'total_records': total_records,
@@ -311,3 +355,53 @@ class DataValidator:
             'errors': errors,
             'warnings': warnings
         }
+    
+    @staticmethod
+    def _clean_energy_readings(data_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Flag energy readings that validate_energy_reading would pass without errors or warnings"""
+        try:
+            df = pd.DataFrame.from_records(data_list)
+            
+            # Required fields
+            if any(field not in df.columns for field in DataValidator._REQUIRED_FIELDS):
+                return np.zeros(len(data_list), dtype=bool)
+            clean = df[list(DataValidator._REQUIRED_FIELDS)].notna().all(axis=1)
+            
+            # Meter ID format
+            meter_ids = df['meter_id']
+            clean &= meter_ids.map(lambda value: isinstance(value, str))
+            clean &= meter_ids.astype(str).str.match(DataValidator._METER_RE)
+            
+            # Timestamp within the accepted window; naive times are taken as UTC
+            timestamps = pd.to_datetime(df['timestamp'], format='ISO8601', utc=True, errors='coerce')
+            now = pd.Timestamp.utcnow()
+            clean &= timestamps.between(now - timedelta(days=30), now + timedelta(hours=1))
+            
+            # Numeric fields: absent or within the quiet range. Columns holding
+            # non-numbers are left to the per-record check.
+            numeric_fields = []
+            for field in DataValidator._CLEAN_READING_RANGES:
+                if field not in df.columns:
+                    continue
+                if pd.api.types.is_numeric_dtype(df[field]):
+                    numeric_fields.append(field)
+                else:
+                    clean &= df[field].isna()
+            
+            # All numeric columns are range-checked in one broadcast comparison
+            if numeric_fields:
+                values = df[numeric_fields].to_numpy(dtype=float)
+                low, high = np.array([DataValidator._CLEAN_READING_RANGES[field] for field in numeric_fields]).T
+                in_range = np.isnan(values) | ((values >= low) & (values <= high))
+                clean &= in_range.all(axis=1)
+            
+            # Quality flag, when the key is present at all
+            if 'quality_flag' in df.columns:
+                flag_absent = pd.Series(['quality_flag' not in record for record in data_list], index=df.index)
+                clean &= flag_absent | df['quality_flag'].isin(DataValidator._QUALITY_FLAGS)
+            
+            return clean.to_numpy(dtype=bool)
+            
+        except Exception as e:
+            logger.error(f"Error pre-screening energy readings: {e}")
+            return np.zeros(len(data_list), dtype=bool)
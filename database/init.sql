@@ -29,6 +29,8 @@ SET search_path TO smartgrid, public;
 -- CREATE INDEX IF NOT EXISTS idx_market_data_timestamp ON market_data(timestamp);
 
 -- Create TimescaleDB hypertables for time-series data (if TimescaleDB is available)
+-- energy_readings and renewable_energy_generation are converted by the backend
+-- on startup (init_timescaledb), together with their continuous aggregates
 -- SELECT create_hypertable('energy_readings', 'timestamp', if_not_exists => TRUE);
 -- SELECT create_hypertable('renewable_energy_generation', 'timestamp', if_not_exists => TRUE);
 -- SELECT create_hypertable('market_data', 'timestamp', if_not_exists => TRUE);
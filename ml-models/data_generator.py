@@ -4,11 +4,11 @@ Generates realistic smart meter and renewable energy data for testing
 """
 
 import random
-import json
 import time
 import math
 from datetime import datetime, timedelta
 from typing import Dict, List
+import orjson
 import paho.mqtt.client as mqtt
 import numpy as np
 import logging
@@ -16,6 +16,16 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Uniform draws used per smart meter reading; the first one is the random
+# variation of its active power
+_METER_DRAWS = 8
+_METER_TYPES = ("residential", "commercial", "industrial")
+
+# Solar panel model: base efficiency and temperature derating above 25 C
+_PANEL_EFFICIENCY = 0.20
+_PANEL_TEMP_COEFF = 0.004
+_PANEL_REFERENCE_TEMP_C = 25
+
 
 class SmartGridDataGenerator:
     """Generates realistic smart grid data"""
@@ -25,6 +35,11 @@ class SmartGridDataGenerator:
         self.mqtt_port = mqtt_port
         self.client = None
         
+        # Own PRNG instances: scalar draws for the solar, wind and grid
+        # readings, array draws for the smart meter batch
+        self._random = random.Random()
+        self._rng = np.random.default_rng()
+        
         # Smart meter configurations
         self.smart_meters = [
             {"id": "SM001", "type": "residential", "base_consumption": 15, "location": [40.7128, -74.0060]},
@@ -40,6 +55,8 @@ class SmartGridDataGenerator:
             {"id": "SP002", "capacity": 25.0, "location": [40.7589, -73.9851]},
             {"id": "SP003", "capacity": 50.0, "location": [40.7505, -73.9934]},
         ]
+        for panel in self.solar_panels:
+            panel["_area"] = panel["capacity"] / _PANEL_EFFICIENCY  # Panel area for the rated capacity
         
         # Wind turbine configurations
         self.wind_turbines = [
@@ -47,6 +64,44 @@ class SmartGridDataGenerator:
             {"id": "WT002", "capacity": 2000.0, "location": [40.5010, -74.2010]},
             {"id": "WT003", "capacity": 1500.0, "location": [40.8000, -74.1000]},
         ]
+        
+        # MQTT topic of every device, in config order
+        self._meter_topics = [f"smartgrid/meters/{m['id']}/data" for m in self.smart_meters]
+        self._solar_topics = [f"smartgrid/solar/{p['id']}/data" for p in self.solar_panels]
+        self._wind_topics = [f"smartgrid/wind/{t['id']}/data" for t in self.wind_turbines]
+        
+        # Hour-of-day lookup tables for the daily patterns below
+        hours = range(24)
+        self._sin_hour = [math.sin(2 * math.pi * hour / 24) for hour in hours]  # peaks at 6am
+        self._sin_hour_from_6 = [math.sin(2 * math.pi * (hour - 6) / 24) for hour in hours]  # peaks at noon
+        
+        # Meter time-of-day factor by meter type
+        self._time_factor = {
+            # Morning and evening peaks, lower during the day, lowest at night
+            "residential": [
+                1.4 if 6 <= hour <= 9 or 17 <= hour <= 22 else 0.7 if 10 <= hour <= 16 else 0.5
+                for hour in hours
+            ],
+            # Business hours
+            "commercial": [1.2 if 8 <= hour <= 18 else 0.3 for hour in hours],
+            "industrial": [1.0 + 0.2 * sin_hour for sin_hour in self._sin_hour]
+        }
+        
+        # Smart meter parameters as arrays, one entry per meter (any other type
+        # follows the industrial pattern)
+        type_codes = {meter_type: code for code, meter_type in enumerate(_METER_TYPES)}
+        self._meter_base = np.fromiter((m["base_consumption"] for m in self.smart_meters), float)
+        self._meter_type_code = np.fromiter(
+            (type_codes.get(m["type"], type_codes["industrial"]) for m in self.smart_meters), np.int8
+        )
+        self._meter_time_factor = np.array([self._time_factor[t] for t in _METER_TYPES])  # (types x 24)
+        self._meter_weekend_factor = np.where(self._meter_type_code == type_codes["commercial"], 0.8, 1.1)
+        
+        # Clear-sky solar irradiance (simplified solar curve: full at noon, 20% at 6am/6pm)
+        self._base_irradiance = [
+            1000 * (1 - abs(12 - hour) / 6 * 0.8) if 6 <= hour <= 18 else 0
+            for hour in hours
+        ]
     
     def connect_mqtt(self):
         """Connect to MQTT broker"""
@@ -67,123 +122,93 @@ class SmartGridDataGenerator:
             self.client.disconnect()
             logger.info("Disconnected from MQTT broker")
     
-    def generate_smart_meter_data(self, meter: Dict) -> Dict:
-        """Generate realistic smart meter data"""
-        now = datetime.utcnow()
-        hour = now.hour
-        day_of_week = now.weekday()
-        
+    def _meter_active_power(self, now: datetime, random_factor: np.ndarray) -> np.ndarray:
+        """Calculate the active power (kW) of every smart meter in one broadcast"""
         # Base consumption with time-of-day and day-of-week patterns
-        base = meter["base_consumption"]
-        
-        # Time of day factor
-        if meter["type"] == "residential":
-            if 6 <= hour <= 9 or 17 <= hour <= 22:  # Morning and evening peaks
-                time_factor = 1.4
-            elif 10 <= hour <= 16:  # Daytime
-                time_factor = 0.7
-            else:  # Night
-                time_factor = 0.5
-        elif meter["type"] == "commercial":
-            if 8 <= hour <= 18:  # Business hours
-                time_factor = 1.2
-            else:
-                time_factor = 0.3
-        else:  # Industrial
-            time_factor = 1.0 + 0.2 * math.sin(2 * math.pi * hour / 24)
-        
-        # Day of week factor
-        if day_of_week < 5:  # Weekday
-            day_factor = 1.0
-        else:  # Weekend
-            day_factor = 0.8 if meter["type"] == "commercial" else 1.1
-        
-        # Random variation
-        random_factor = random.uniform(0.85, 1.15)
-        
-        # Calculate power
-        active_power = base * time_factor * day_factor * random_factor
+        time_factor = self._meter_time_factor[self._meter_type_code, now.hour]
+        day_factor = 1.0 if now.weekday() < 5 else self._meter_weekend_factor
         
+        return self._meter_base * time_factor * day_factor * random_factor
+    
+    def generate_smart_meter_data(self, meter: Dict, iso: str, active_power: float, r: List[float]) -> Dict:
+        """Generate realistic smart meter data from its active power and a row of uniform [0, 1) draws"""
         # Calculate other electrical parameters
-        voltage_l1 = random.uniform(225, 235)
+        voltage_l1 = 225 + 10 * r[1]
         current_l1 = active_power * 1000 / voltage_l1  # Convert kW to W
-        power_factor = random.uniform(0.92, 0.98)
-        frequency = random.uniform(49.8, 50.2)
+        power_factor = 0.92 + 0.06 * r[2]
+        frequency = 49.8 + 0.4 * r[3]
         
         # Energy is power * time interval (assuming 15-minute intervals)
         active_energy = active_power * 0.25  # kWh for 15 minutes
         
         return {
             "meter_id": meter["id"],
-            "timestamp": now.isoformat(),
-            "active_energy": round(active_energy, 3),
-            "reactive_energy": round(active_energy * 0.1, 3),
-            "apparent_energy": round(active_energy * 1.05, 3),
-            "active_power": round(active_power, 2),
-            "reactive_power": round(active_power * 0.1, 2),
-            "power_factor": round(power_factor, 3),
-            "voltage_l1": round(voltage_l1, 1),
-            "voltage_l2": round(voltage_l1 + random.uniform(-2, 2), 1),
-            "voltage_l3": round(voltage_l1 + random.uniform(-2, 2), 1),
-            "current_l1": round(current_l1, 2),
-            "current_l2": round(current_l1 + random.uniform(-1, 1), 2),
-            "current_l3": round(current_l1 + random.uniform(-1, 1), 2),
-            "frequency": round(frequency, 2),
+            "timestamp": iso,
+            "active_energy": active_energy,
+            "reactive_energy": active_energy * 0.1,
+            "apparent_energy": active_energy * 1.05,
+            "active_power": active_power,
+            "reactive_power": active_power * 0.1,
+            "power_factor": power_factor,
+            "voltage_l1": voltage_l1,
+            "voltage_l2": voltage_l1 - 2 + 4 * r[4],
+            "voltage_l3": voltage_l1 - 2 + 4 * r[5],
+            "current_l1": current_l1,
+            "current_l2": current_l1 - 1 + 2 * r[6],
+            "current_l3": current_l1 - 1 + 2 * r[7],
+            "frequency": frequency,
             "quality_flag": "good"
         }
     
-    def generate_solar_data(self, panel: Dict) -> Dict:
+    def generate_solar_data(self, panel: Dict, now: datetime, iso: str) -> Dict:
         """Generate realistic solar panel data"""
-        now = datetime.utcnow()
         hour = now.hour
         
         # Solar irradiance based on time of day
-        if 6 <= hour <= 18:
-            # Simplified solar curve
-            solar_angle = abs(12 - hour) / 6  # 0 at noon, 1 at 6am/6pm
-            base_irradiance = 1000 * (1 - solar_angle * 0.8)
-            
+        base_irradiance = self._base_irradiance[hour]
+        if base_irradiance > 0:
             # Add weather variation
-            cloud_factor = random.uniform(0.7, 1.0)
+            cloud_factor = self._random.uniform(0.7, 1.0)
             irradiance = base_irradiance * cloud_factor
         else:
             irradiance = 0
         
         # Temperature variation
-        temperature = 20 + 15 * math.sin(2 * math.pi * (hour - 6) / 24) + random.uniform(-3, 3)
+        temperature = 20 + 15 * self._sin_hour_from_6[hour] + self._random.uniform(-3, 3)
         
         # Power output calculation
-        efficiency = 0.20 * (1 - 0.004 * max(0, temperature - 25))  # Temperature derating
-        panel_area = panel["capacity"] / 0.20  # Assuming 20% base efficiency
-        power_output = (irradiance / 1000) * panel_area * efficiency
+        efficiency = _PANEL_EFFICIENCY * (
+            1 - _PANEL_TEMP_COEFF * max(0, temperature - _PANEL_REFERENCE_TEMP_C)
+        )  # Temperature derating
+        power_output = (irradiance / 1000) * panel["_area"] * efficiency
         
         # Capacity factor
         capacity_factor = power_output / panel["capacity"] if panel["capacity"] > 0 else 0
         
         return {
             "panel_id": panel["id"],
-            "timestamp": now.isoformat(),
-            "power_output_kw": round(max(0, power_output), 2),
-            "energy_generated_kwh": round(max(0, power_output * 0.25), 3),  # 15-minute interval
-            "irradiance_wm2": round(max(0, irradiance), 1),
-            "temperature_c": round(temperature, 1),
-            "capacity_factor": round(max(0, capacity_factor), 3),
-            "efficiency": round(efficiency, 3)
+            "timestamp": iso,
+            "power_output_kw": max(0, power_output),
+            "energy_generated_kwh": max(0, power_output * 0.25),  # 15-minute interval
+            "irradiance_wm2": max(0, irradiance),
+            "temperature_c": temperature,
+            "capacity_factor": max(0, capacity_factor),
+            "efficiency": efficiency
         }
     
-    def generate_wind_data(self, turbine: Dict) -> Dict:
+    def generate_wind_data(self, turbine: Dict, now: datetime, iso: str) -> Dict:
         """Generate realistic wind turbine data"""
-        now = datetime.utcnow()
+        sin_hour = self._sin_hour[now.hour]
         
         # Wind speed variation (simplified model)
-        base_wind_speed = 8 + 4 * math.sin(2 * math.pi * now.hour / 24)
-        wind_speed = max(0, base_wind_speed + random.uniform(-3, 3))
+        base_wind_speed = 8 + 4 * sin_hour
+        wind_speed = max(0, base_wind_speed + self._random.uniform(-3, 3))
         
         # Wind direction
-        wind_direction = random.uniform(0, 360)
+        wind_direction = self._random.uniform(0, 360)
         
         # Temperature
-        temperature = 15 + 10 * math.sin(2 * math.pi * now.hour / 24) + random.uniform(-2, 2)
+        temperature = 15 + 10 * sin_hour + self._random.uniform(-2, 2)
         
         # Power curve calculation (simplified)
         cut_in_speed = 3.0
@@ -200,45 +225,43 @@ class SmartGridDataGenerator:
             power_output = turbine["capacity"] * power_ratio
         
         # Add some efficiency losses
-        power_output *= random.uniform(0.95, 1.0)
+        power_output *= self._random.uniform(0.95, 1.0)
         
         # Capacity factor
         capacity_factor = power_output / turbine["capacity"] if turbine["capacity"] > 0 else 0
         
         return {
             "turbine_id": turbine["id"],
-            "timestamp": now.isoformat(),
-            "power_output_kw": round(max(0, power_output), 1),
-            "energy_generated_kwh": round(max(0, power_output * 0.25), 3),  # 15-minute interval
-            "wind_speed_ms": round(wind_speed, 1),
-            "wind_direction_deg": round(wind_direction, 1),
-            "temperature_c": round(temperature, 1),
-            "capacity_factor": round(max(0, capacity_factor), 3),
-            "efficiency": round(random.uniform(0.92, 0.98), 3)
+            "timestamp": iso,
+            "power_output_kw": max(0, power_output),
+            "energy_generated_kwh": max(0, power_output * 0.25),  # 15-minute interval
+            "wind_speed_ms": wind_speed,
+            "wind_direction_deg": wind_direction,
+            "temperature_c": temperature,
+            "capacity_factor": max(0, capacity_factor),
+            "efficiency": self._random.uniform(0.92, 0.98)
         }
     
-    def generate_grid_status(self) -> Dict:
+    def generate_grid_status(self, now: datetime, iso: str) -> Dict:
         """Generate grid status data"""
-        now = datetime.utcnow()
-        
         # Grid frequency (should be close to 50 Hz)
-        frequency = 50.0 + random.uniform(-0.1, 0.1)
+        frequency = 50.0 + self._random.uniform(-0.1, 0.1)
         
         # Voltage stability (0-1 scale)
-        voltage_stability = random.uniform(0.95, 1.0)
+        voltage_stability = self._random.uniform(0.95, 1.0)
         
         # Total demand and supply (simplified)
         hour = now.hour
-        base_demand = 1000 + 200 * math.sin(2 * math.pi * (hour - 6) / 24)
-        total_demand = base_demand + random.uniform(-50, 50)
-        total_supply = total_demand + random.uniform(-20, 30)
+        base_demand = 1000 + 200 * self._sin_hour_from_6[hour]
+        total_demand = base_demand + self._random.uniform(-50, 50)
+        total_supply = total_demand + self._random.uniform(-20, 30)
         
         return {
-            "timestamp": now.isoformat(),
-            "frequency_hz": round(frequency, 3),
-            "voltage_stability": round(voltage_stability, 3),
-            "total_demand_mw": round(total_demand, 1),
-            "total_supply_mw": round(total_supply, 1),
+            "timestamp": iso,
+            "frequency_hz": frequency,
+            "voltage_stability": voltage_stability,
+            "total_demand_mw": total_demand,
+            "total_supply_mw": total_supply,
             "grid_status": "normal" if abs(frequency - 50.0) < 0.05 else "warning"
         }
     
@@ -248,31 +271,41 @@ class SmartGridDataGenerator:
             logger.error("MQTT client not connected")
             return
         
-        # Generate and publish smart meter data
-        for meter in self.smart_meters:
-            data = self.generate_smart_meter_data(meter)
-            topic = f"smartgrid/meters/{meter['id']}/data"
-            self.client.publish(topic, json.dumps(data))
-            logger.info(f"Published meter data: {meter['id']}")
-        
-        # Generate and publish solar data
-        for panel in self.solar_panels:
-            data = self.generate_solar_data(panel)
-            topic = f"smartgrid/solar/{panel['id']}/data"
-            self.client.publish(topic, json.dumps(data))
-            logger.info(f"Published solar data: {panel['id']}")
-        
-        # Generate and publish wind data
-        for turbine in self.wind_turbines:
-            data = self.generate_wind_data(turbine)
-            topic = f"smartgrid/wind/{turbine['id']}/data"
-            self.client.publish(topic, json.dumps(data))
-            logger.info(f"Published wind data: {turbine['id']}")
-        
-        # Generate and publish grid status
-        grid_data = self.generate_grid_status()
-        self.client.publish("smartgrid/grid/status", json.dumps(grid_data))
-        logger.info("Published grid status")
+        # All readings of a tick share one timestamp
+        now = datetime.utcnow()
+        iso = now.isoformat()
+        
+        # Encode every message of the tick first, then publish them back to back
+        messages = []
+        
+        # Smart meter data, with all random draws for the meters made at once
+        draws = self._rng.random((len(self.smart_meters), _METER_DRAWS))
+        active_power = self._meter_active_power(now, 0.85 + 0.3 * draws[:, 0]).tolist()
+        for topic, meter, power, r in zip(self._meter_topics, self.smart_meters, active_power, draws.tolist()):
+            data = self.generate_smart_meter_data(meter, iso, power, r)
+            messages.append((topic, orjson.dumps(data)))
+        
+        # Solar data
+        for topic, panel in zip(self._solar_topics, self.solar_panels):
+            data = self.generate_solar_data(panel, now, iso)
+            messages.append((topic, orjson.dumps(data)))
+        
+        # Wind data
+        for topic, turbine in zip(self._wind_topics, self.wind_turbines):
+            data = self.generate_wind_data(turbine, now, iso)
+            messages.append((topic, orjson.dumps(data)))
+        
+        # Grid status
+        messages.append(("smartgrid/grid/status", orjson.dumps(self.generate_grid_status(now, iso))))
+        
+        for topic, payload in messages:
+            self.client.publish(topic, payload, qos=0)
+            logger.debug(f"Published {topic}")
+        
+        logger.info(
+            f"Published {len(self.smart_meters)} meter, {len(self.solar_panels)} solar, "
+            f"{len(self.wind_turbines)} wind readings and grid status"
+        )
     
     def run_continuous(self, interval: int = 900):  # 15 minutes default
         """Run data generation continuously"""
@@ -282,9 +315,17 @@ class SmartGridDataGenerator:
             return
         
         try:
+            # Anchor ticks to the monotonic clock so publish time does not add drift
+            next_tick = time.monotonic()
             while True:
                 self.publish_data()
-                time.sleep(interval)
+                next_tick += interval
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Running behind: skip the missed ticks instead of bursting
+                    next_tick = time.monotonic()
         except KeyboardInterrupt:
             logger.info("Stopping data generation...")
         finally:
@@ -3,13 +3,15 @@ Generate Historical Training Data for LSTM Model
 Creates realistic historical energy consumption data for the past 30 days
 """
 
+import io
+import csv
 import os
 import sys
 import math
-import random
+import numpy as np
 import psycopg2
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 # Database configuration
 DB_CONFIG = {
@@ -29,115 +31,110 @@ METERS = [
     {"id": "SM005", "type": "residential", "base_consumption": 5.5}
 ]
 
-def generate_realistic_consumption(meter: Dict, timestamp: datetime) -> Dict:
+# Column order of the generated rows and of the COPY below
+READING_COLUMNS = (
+    "meter_id", "timestamp", "active_energy", "reactive_energy", "apparent_energy",
+    "active_power", "reactive_power", "power_factor",
+    "voltage_l1", "voltage_l2", "voltage_l3",
+    "current_l1", "current_l2", "current_l3",
+    "frequency", "quality_flag"
+)
+
+def generate_realistic_consumption(meters: List[Dict], timestamps: np.ndarray) -> List[Tuple]:
     """Generate realistic energy consumption data based on time patterns"""
     
-    hour = timestamp.hour
-    day_of_week = timestamp.weekday()
-    month = timestamp.month
+    # Every (timestamp, meter) reading is computed at once as (hours x meters)
+    # arrays; rows come back timestamp by timestamp, meter by meter, with the
+    # values in READING_COLUMNS order
+    rng = np.random.default_rng()
+    shape = (len(timestamps), len(meters))
+    
+    hour = timestamps.astype("datetime64[h]").astype(np.int64) % 24
+    day_of_week = (timestamps.astype("datetime64[D]").astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    month = timestamps.astype("datetime64[M]").astype(np.int64) % 12 + 1
     
     # Base consumption
-    base = meter["base_consumption"]
+    base = np.array([meter["base_consumption"] for meter in meters])
     
-    # Time of day pattern (peak hours: 7-9 AM, 5-9 PM)
-    if 7 <= hour <= 9 or 17 <= hour <= 21:
-        time_factor = 1.5  # Peak hours
-    elif 0 <= hour <= 6:
-        time_factor = 0.5  # Night hours
-    else:
-        time_factor = 1.0  # Normal hours
+    # Time of day pattern (peak hours: 7-9 AM, 5-9 PM; night hours 0-6)
+    peak = ((hour >= 7) & (hour <= 9)) | ((hour >= 17) & (hour <= 21))
+    time_factor = np.where(peak, 1.5, np.where(hour <= 6, 0.5, 1.0))
     
-    # Day of week pattern (weekends slightly different)
-    if day_of_week >= 5:  # Weekend
-        if meter["type"] == "commercial" or meter["type"] == "industrial":
-            day_factor = 0.3  # Lower consumption on weekends
-        else:
-            day_factor = 1.2  # Higher residential consumption on weekends
-    else:
-        day_factor = 1.0
+    # Day of week pattern (weekends: lower commercial/industrial, higher residential consumption)
+    business = np.array([meter["type"] in ("commercial", "industrial") for meter in meters])
+    weekend_factor = np.where(business, 0.3, 1.2)
+    day_factor = np.where((day_of_week >= 5)[:, None], weekend_factor[None, :], 1.0)
     
     # Seasonal pattern (summer/winter higher due to AC/heating)
-    if month in [6, 7, 8, 12, 1, 2]:
-        season_factor = 1.3
-    else:
-        season_factor = 1.0
-    
-    # Calculate active power (kW)
-    active_power = base * time_factor * day_factor * season_factor
+    season_factor = np.where(np.isin(month, [6, 7, 8, 12, 1, 2]), 1.3, 1.0)
     
-    # Add random variation (±15%)
-    active_power *= random.uniform(0.85, 1.15)
+    # Calculate active power (kW), with random variation (±15%)
+    active_power = base[None, :] * (time_factor * season_factor)[:, None] * day_factor
+    active_power *= rng.uniform(0.85, 1.15, size=shape)
     
     # Calculate energy for 1-hour interval
     active_energy = active_power
     
     # Electrical parameters
-    voltage_l1 = 230 + random.uniform(-5, 5)
+    voltage_l1 = 230 + rng.uniform(-5, 5, size=shape)
     current_l1 = active_power * 1000 / voltage_l1 / math.sqrt(3)
-    power_factor = random.uniform(0.92, 0.98)
-    frequency = 50.0 + random.uniform(-0.05, 0.05)
+    power_factor = rng.uniform(0.92, 0.98, size=shape)
+    frequency = 50.0 + rng.uniform(-0.05, 0.05, size=shape)
     
-    return {
-        "meter_id": meter["id"],
-        "timestamp": timestamp,
-        "active_energy": round(active_energy, 3),
-        "reactive_energy": round(active_energy * 0.1, 3),
-        "apparent_energy": round(active_energy * 1.05, 3),
-        "active_power": round(active_power, 2),
-        "reactive_power": round(active_power * 0.1, 2),
-        "power_factor": round(power_factor, 3),
-        "voltage_l1": round(voltage_l1, 1),
-        "voltage_l2": round(voltage_l1 + random.uniform(-2, 2), 1),
-        "voltage_l3": round(voltage_l1 + random.uniform(-2, 2), 1),
-        "current_l1": round(current_l1, 2),
-        "current_l2": round(current_l1 + random.uniform(-0.5, 0.5), 2),
-        "current_l3": round(current_l1 + random.uniform(-0.5, 0.5), 2),
-        "frequency": round(frequency, 2),
-        "quality_flag": "good"
+    columns = {
+        "meter_id": np.broadcast_to(np.array([meter["id"] for meter in meters]), shape),
+        "timestamp": np.broadcast_to(timestamps[:, None], shape),
+        "active_energy": np.round(active_energy, 3),
+        "reactive_energy": np.round(active_energy * 0.1, 3),
+        "apparent_energy": np.round(active_energy * 1.05, 3),
+        "active_power": np.round(active_power, 2),
+        "reactive_power": np.round(active_power * 0.1, 2),
+        "power_factor": np.round(power_factor, 3),
+        "voltage_l1": np.round(voltage_l1, 1),
+        "voltage_l2": np.round(voltage_l1 + rng.uniform(-2, 2, size=shape), 1),
+        "voltage_l3": np.round(voltage_l1 + rng.uniform(-2, 2, size=shape), 1),
+        "current_l1": np.round(current_l1, 2),
+        "current_l2": np.round(current_l1 + rng.uniform(-0.5, 0.5, size=shape), 2),
+        "current_l3": np.round(current_l1 + rng.uniform(-0.5, 0.5, size=shape), 2),
+        "frequency": np.round(frequency, 2),
+        "quality_flag": np.broadcast_to(np.array("good"), shape)
     }
+    
+    # Back to Python values (datetime, float, str) one column at a time
+    values = [columns[name].ravel().tolist() for name in READING_COLUMNS]
+    return list(zip(*values))
 
-def insert_historical_data(conn, readings: List[Dict]):
-    """Insert historical readings into database"""
+def insert_historical_data(conn, rows: List[Tuple]) -> int:
+    """Insert historical readings into database, returning how many were new"""
     cursor = conn.cursor()
-
-    insert_query = """
-    INSERT INTO energy_readings (
-        meter_id, timestamp, active_energy, reactive_energy, apparent_energy,
-        active_power, reactive_power, power_factor,
-        voltage_l1, voltage_l2, voltage_l3,
-        current_l1, current_l2, current_l3,
-        frequency, quality_flag
-    ) VALUES (
-        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    columns = ", ".join(READING_COLUMNS)
+
+    # Stream all rows as one CSV through COPY into a staging table, then move
+    # them over in a single INSERT that leaves out readings already stored for
+    # the same meter and timestamp
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+
+    cursor.execute(f"""
+    CREATE TEMP TABLE energy_readings_staging ON COMMIT DROP AS
+    SELECT {columns} FROM energy_readings WITH NO DATA;
+    """)
+    cursor.copy_expert(f"COPY energy_readings_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(f"""
+    INSERT INTO energy_readings ({columns})
+    SELECT {columns} FROM energy_readings_staging s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM energy_readings e
+        WHERE e.meter_id = s.meter_id AND e.timestamp = s.timestamp
     );
-    """
-
-    for reading in readings:
-        try:
-            cursor.execute(insert_query, (
-                reading["meter_id"],
-                reading["timestamp"],
-                reading["active_energy"],
-                reading["reactive_energy"],
-                reading["apparent_energy"],
-                reading["active_power"],
-                reading["reactive_power"],
-                reading["power_factor"],
-                reading["voltage_l1"],
-                reading["voltage_l2"],
-                reading["voltage_l3"],
-                reading["current_l1"],
-                reading["current_l2"],
-                reading["current_l3"],
-                reading["frequency"],
-                reading["quality_flag"]
-            ))
-        except Exception:
-            # Skip duplicates silently
-            pass
+    """)
+    inserted = cursor.rowcount
 
     conn.commit()
     cursor.close()
+    return inserted
 
 def main():
     """Generate and insert historical data"""
@@ -163,32 +160,20 @@ def main():
     end_time = datetime.utcnow()
     start_time = end_time - timedelta(days=days_to_generate)
 
-    batch_size = 100
-    readings_batch = []
-    total_inserted = 0
-
-    # Generate hourly data
-    current_time = start_time
-    while current_time <= end_time:
-        for meter in METERS:
-            reading = generate_realistic_consumption(meter, current_time)
-            readings_batch.append(reading)
-
-            # Insert in batches
-            if len(readings_batch) >= batch_size:
-                insert_historical_data(conn, readings_batch)
-                total_inserted += len(readings_batch)
-                print(f"   Inserted {total_inserted:,} readings...", end='\r')
-                readings_batch = []
-
-        current_time += timedelta(hours=1)
+    # Generate hourly data for all meters at once
+    timestamps = np.arange(
+        np.datetime64(start_time, "us"),
+        np.datetime64(end_time, "us") + np.timedelta64(1, "us"),
+        np.timedelta64(1, "h")
+    )
+    rows = generate_realistic_consumption(METERS, timestamps)
 
-    # Insert remaining readings
-    if readings_batch:
-        insert_historical_data(conn, readings_batch)
-        total_inserted += len(readings_batch)
+    # One transaction for the whole set
+    total_inserted = insert_historical_data(conn, rows)
 
     print(f"\n✅ Successfully inserted {total_inserted:,} historical readings")
+    if total_inserted < len(rows):
+        print(f"   Skipped {len(rows) - total_inserted:,} readings already stored")
 
     # Verify data
     cursor = conn.cursor()
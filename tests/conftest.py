@@ -0,0 +1,247 @@
+"""
+Shared fixtures for the Smart Grid IoT Analytics test suite
+"""
+
+import os
+import sys
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+import pytest_asyncio
+from blockbuster import BlockBuster
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import sessionmaker
+
+# Add backend to PYTHONPATH for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+# Timestamp of the reading test_submit_meter_reading posts (its FIXED_TS)
+SUBMITTED_READING_TS = datetime(2024, 4, 1, 10, 0, 0)
+
+# User every API request in the tests runs as
+TEST_USERNAME = "test_user"
+
+# Meter whose only readings are SUMMARY_READINGS, so its summary totals are known
+SUMMARY_METER_ID = "TEST-SUMMARY"
+
+# (hours before now, active_energy kWh, active_power kW), all inside the hourly summary window
+SUMMARY_READINGS = [
+    (1, 1.5, 3.0),
+    (2, 2.0, 4.0),
+    (3, 2.5, 5.0),
+]
+
+# Read-only GETs the tests check through get_json, prefetched together at session start
+READ_REQUESTS = [
+    ("/api/v1/energy/consumption", {"meter_id": "SM001", "limit": 50}),
+    ("/api/v1/pricing/tiers", {}),
+    ("/api/v1/renewable/summary", {}),
+    ("/api/v1/predictions/models/status", {}),
+    ("/api/v1/predictions/energy/accuracy", {}),
+    ("/", {}),
+]
+
+
+async def _fetch_all(app, requests):
+    """Send GET requests to the app concurrently"""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        return await asyncio.gather(*[ac.get(url, params=params) for url, params in requests])
+
+
+@pytest.fixture(autouse=True)
+def no_blocking_calls():
+    """Fail any test whose request path makes a blocking call on the event loop thread"""
+    blockbuster = BlockBuster()
+    blockbuster.activate()
+    yield
+    blockbuster.deactivate()
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The FastAPI app, imported on first use so collection does not load the backend"""
+    from app.main import app as fastapi_app
+    return fastapi_app
+
+
+@pytest.fixture(scope="session")
+def test_engine(app):
+    """Pooled engine for the test session, so requests reuse open connections"""
+    from app.core.config import settings
+    
+    test_engine = create_engine(settings.DATABASE_URL, pool_size=5, pool_pre_ping=True)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def override_get_db(app, test_engine):
+    """Serve request sessions from the pooled test engine"""
+    from app.core.database import get_db
+    
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    
+    def get_test_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    app.dependency_overrides[get_db] = get_test_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    """Test client shared by the whole session (app startup and shutdown run once)"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest_asyncio.fixture(scope="session")
+async def async_client(app):
+    """Async client shared by the whole session, calling the app in-process"""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.fixture(scope="session")
+def seed_meters(client, test_engine):
+    """Make sure the meter the reading tests submit to exists (tables are created at app startup)"""
+    from app.models.smart_meter import SmartMeter
+    
+    with test_engine.begin() as conn:
+        conn.execute(
+            insert(SmartMeter)
+            .values(
+                meter_id="SM001",
+                location="Test Location",
+                latitude=40.7128,
+                longitude=-74.0060,
+                meter_type="residential",
+                installation_date=datetime(2024, 1, 1),
+                firmware_version="v2.1.3"
+            )
+            .on_conflict_do_nothing(index_elements=["meter_id"])
+        )
+
+
+@pytest.fixture(scope="session")
+def summary_meter(client, test_engine):
+    """Seed a meter with SUMMARY_READINGS in the last hours; yields its ID and those readings"""
+    from app.models.smart_meter import SmartMeter, EnergyReading
+    
+    now = datetime.utcnow()
+    with test_engine.begin() as conn:
+        conn.execute(
+            insert(SmartMeter)
+            .values(
+                meter_id=SUMMARY_METER_ID,
+                location="Test Location",
+                latitude=40.7128,
+                longitude=-74.0060,
+                meter_type="residential",
+                installation_date=datetime(2024, 1, 1),
+                firmware_version="v2.1.3"
+            )
+            .on_conflict_do_nothing(index_elements=["meter_id"])
+        )
+        # Drop readings an interrupted run may have left behind
+        conn.execute(delete(EnergyReading).where(EnergyReading.meter_id == SUMMARY_METER_ID))
+        conn.execute(
+            insert(EnergyReading),
+            [
+                {
+                    "meter_id": SUMMARY_METER_ID,
+                    "timestamp": now - timedelta(hours=hours_ago),
+                    "active_energy": active_energy,
+                    "active_power": active_power
+                }
+                for hours_ago, active_energy, active_power in SUMMARY_READINGS
+            ]
+        )
+    
+    yield SUMMARY_METER_ID, SUMMARY_READINGS
+    
+    with test_engine.begin() as conn:
+        conn.execute(delete(EnergyReading).where(EnergyReading.meter_id == SUMMARY_METER_ID))
+        conn.execute(delete(SmartMeter).where(SmartMeter.meter_id == SUMMARY_METER_ID))
+
+
+@pytest.fixture
+def submitted_reading_cleanup(test_engine):
+    """Delete the SM001 reading the submission test posts, so runs do not pile up rows"""
+    from app.models.smart_meter import EnergyReading
+    
+    yield
+    with test_engine.begin() as conn:
+        conn.execute(
+            delete(EnergyReading)
+            .where(EnergyReading.meter_id == "SM001")
+            .where(EnergyReading.timestamp == SUBMITTED_READING_TS)
+        )
+
+
+@pytest.fixture(scope="session")
+def test_user(client, test_engine):
+    """Seed the user the API tests authenticate as"""
+    from app.models.user import User, UserRole
+    
+    with test_engine.begin() as conn:
+        conn.execute(
+            insert(User)
+            .values(
+                username=TEST_USERNAME,
+                email="test_user@smartgrid.local",
+                full_name="Test User",
+                hashed_password="!",  # Never matches a password; the tests skip login
+                role=UserRole.VIEWER,
+                is_active=True,
+                is_superuser=False
+            )
+            .on_conflict_do_nothing(index_elements=["username"])
+        )
+    return TEST_USERNAME
+
+
+@pytest.fixture(scope="session")
+def override_current_user(app, test_user):
+    """Authenticate every request as the seeded test user instead of by bearer token"""
+    from app.core.database import get_db
+    from app.core.security import get_current_user
+    from app.models.user import User
+    
+    def get_test_user(db=Depends(get_db)):
+        return db.query(User).filter(User.username == test_user).one()
+    
+    app.dependency_overrides[get_current_user] = get_test_user
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+
+@pytest.fixture(scope="session")
+def get_json(app, client, seed_meters, override_current_user):
+    """GET a read-only endpoint, assert 200 and return its parsed JSON, cached for the session"""
+    cache = {}
+    
+    # Fire the known reads in one concurrent burst; anything that did not
+    # return 200 is requested again (and asserted) by the test that needs it
+    for (url, params), response in zip(READ_REQUESTS, asyncio.run(_fetch_all(app, READ_REQUESTS))):
+        if response.status_code == 200:
+            cache[(url, tuple(sorted(params.items())))] = response.json()
+    
+    def _get_json(url, **params):
+        key = (url, tuple(sorted(params.items())))
+        if key not in cache:
+            response = client.get(url, params=params)
+            assert response.status_code == 200
+            cache[key] = response.json()
+        return cache[key]
+    
+    return _get_json
@@ -0,0 +1,70 @@
+"""
+Billing Tests for Smart Grid IoT Analytics
+Checks the vectorized bill charges against the per-meter calculation
+"""
+
+import pytest
+
+# Integer cents per MWh, as returned by _get_pricing_for_period
+PRICING = {
+    "base_price_mwh": 12000,
+    "peak_price_mwh": 18000,
+    "off_peak_price_mwh": 9600
+}
+
+# "unknown" falls into the default slot of the per-type lookup tables
+METER_TYPES = ["residential", "commercial", "industrial", "unknown"]
+
+
+@pytest.fixture(scope="module")
+def billing_service():
+    """Billing service; the charge calculations need no database"""
+    from app.services.billing_service import BillingService
+    return BillingService()
+
+
+@pytest.fixture(scope="module")
+def consumptions():
+    """Consumption figures in Wh / W, including odd values that exercise rounding"""
+    from app.services.billing_service import Consumption
+    
+    figures = [
+        # (peak, off-peak, standard) Wh, peak demand W, reading count
+        ((0, 0, 0), 0, 1),
+        ((1, 1, 1), 1, 3),
+        ((41_337, 120_501, 98_765), 4_321, 720),
+        ((2_500_003, 7_000_049, 5_123_457), 512_345, 2976),
+    ]
+    return [
+        Consumption(
+            total_energy=peak + off_peak + standard,
+            peak_energy=peak,
+            off_peak_energy=off_peak,
+            standard_energy=standard,
+            peak_demand=peak_demand,
+            reading_count=reading_count
+        )
+        for (peak, off_peak, standard), peak_demand, reading_count in figures
+    ]
+
+
+class TestChargesVectorized:
+    """Test the vectorized charges match the scalar tariff formulas"""
+    
+    @pytest.mark.parametrize("meter_type", METER_TYPES)
+    def test_matches_scalar_per_meter_type(self, billing_service, consumptions, meter_type):
+        """Test every consumption figure is charged the same by both paths"""
+        batch = billing_service._calculate_charges_vec(
+            consumptions, PRICING, [meter_type] * len(consumptions)
+        )
+        for index, consumption in enumerate(consumptions):
+            assert batch[index] == billing_service._calculate_charges(consumption, PRICING, meter_type)
+    
+    def test_matches_scalar_mixed_meter_types(self, billing_service, consumptions):
+        """Test a batch mixing meter types picks each meter's own rates"""
+        pairs = [(consumption, meter_type) for consumption in consumptions for meter_type in METER_TYPES]
+        batch = billing_service._calculate_charges_vec(
+            [consumption for consumption, _ in pairs], PRICING, [meter_type for _, meter_type in pairs]
+        )
+        for index, (consumption, meter_type) in enumerate(pairs):
+            assert batch[index] == billing_service._calculate_charges(consumption, PRICING, meter_type)